@@ -1,133 +1,159 @@
 import streamlit as st
 import pandas as pd
 import os
-import plotly.graph_objects as go
-import plotly.express as px
-import numpy as np
+
+from idl_stats import instrument
+from idl_stats.charts import (
+    h2h_figure, most_180s_figure, rating_figure, rolling_figure, scoreline_figure, trend_figure, visits_figure,
+)
+from idl_stats.cube import band_counts, player_stats as cube_player_stats
+from idl_stats.dataset import build_dataset
+from idl_stats.dedup import summarize_issues
+from idl_stats.engine import add_leg_stats, throw_columns
+from idl_stats.ingest import IngestCache, folder_signature
+from idl_stats.live import LiveDataset
+from idl_stats.predict import BEST_OF, player_model, predict_match
+from idl_stats.ratings import update_ratings
+from idl_stats.report import distribution_table, form_table, player_trend, with_ratings
+from idl_stats.trends import FORM_LEGS, FORM_MATCHES
+from idl_stats.selection import ALL_COMPETITIONS, ALL_DIVISIONS, Selection
+from idl_stats.store import load_with_snapshot
 
 # --- Page Config ---
 st.set_page_config(page_title="IDL Stats", layout="wide")
 st.title("IDL Stats")
 
-# --- Helper Functions ---
-def detect_data_type(df):
-    """Determine if the CSV is a Competition or League file."""
-    has_division = "Division" in df.columns and df["Division"].notna().any()
-    has_date = "Date" in df.columns and df["Date"].notna().any()
+# Stage timings and cache hits of this rerun, logged as one JSON line when it ends
+# (IDL_STATS_LOG sets the log file; empty disables it)
+instrument.configure_logging(os.environ.get("IDL_STATS_LOG", "streamlit_log.txt"))
+run_timings = instrument.start_run()
 
-    if has_division and not has_date:
-        return "League"
-    else:
-        return "Competition"
+# Worker processes used to parse CSVs when many files change at once (e.g. a bulk re-import)
+INGEST_WORKERS = os.cpu_count() or 1
+
+# Only run the open tab's body on each rerun (IDL_LAZY_TABS=0 renders all five as before)
+LAZY_TABS = os.environ.get("IDL_LAZY_TABS", "1") != "0"
 
-# Keeping the function name from the fix to ensure cache stability
-@st.cache_data(show_spinner="Loading and processing data...")
-def load_data_v4_fix(data_folder):
+# Watch mode: poll the data folder every IDL_WATCH seconds and fold new CSVs into
+# the loaded tables, rerunning every open session when they change (0/unset: off)
+WATCH_SECONDS = float(os.environ.get("IDL_WATCH") or 0)
+
+# Most figures kept by the figure cache (least recently used are dropped first)
+FIGURE_CACHE_ENTRIES = 256
+
+# --- Helper Functions ---
+@st.cache_resource
+def get_ingest_cache():
+    """One per-file ingest cache for the server process, shared across reruns."""
+    return IngestCache()
+
+@st.cache_resource
+def get_live_dataset(data_folder):
+    """Watch mode: one dataset for the server process that follows the data folder."""
+    return LiveDataset(data_folder, workers=INGEST_WORKERS)
+
+# Keeping the function name from the fix to ensure cache stability.
+# The folder signature is part of the cache key, so adding or editing a CSV
+# invalidates this entry and only the changed files are re-processed.
+# A cache_resource: every session and rerun gets the same Dataset object rather
+# than its own deserialized copy, so it must be treated as read-only.
+@st.cache_resource(max_entries=2, show_spinner="Loading and processing data...")
+def load_data_v4_fix(data_folder, signature=None):
     """
     Loads all CSVs, combines them, and performs heavy processing
-    (Date parsing, Numeric conversion, and STATS CALCULATION) only once.
+    (Date parsing, Numeric conversion, and STATS CALCULATION) only once per file.
+    On a cold start the processed frame comes from the on-disk snapshot
+    (data/.snapshot) when it still matches the CSVs.
+    Returns (dataset, errors): a Dataset with the legs table plus the visit and
+    match-level tables, the pre-aggregated player cube, the head-to-head index
+    and the ratings, and the (file, error) pairs of the unreadable CSVs.
     """
-    all_data = []
-
-    if not os.path.exists(data_folder):
-        return pd.DataFrame()
-
-    for file in os.listdir(data_folder):
-        if file.endswith(".csv"):
-            file_path = os.path.join(data_folder, file)
-            try:
-                df = pd.read_csv(file_path)
-                df["OriginalDate"] = df.get("Date", "")
-                df["DataType"] = detect_data_type(df)
-                all_data.append(df)
-            except Exception as e:
-                st.error(f"Error reading {file}: {e}")
-
-    if not all_data:
-        return pd.DataFrame()
-
-    full_df = pd.concat(all_data, ignore_index=True)
-
-    # 1. Process Season (League)
-    if "Season" in full_df.columns:
-        full_df["Season"] = pd.to_numeric(full_df["Season"], errors="coerce").astype("Int64")
-
-    # 2. Parse Dates (Competition)
-    full_df["ParsedDate"] = pd.NaT
-    if "OriginalDate" in full_df.columns:
-        date_formats = ["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d %m %Y"]
-        for fmt in date_formats:
-            mask_unparsed = full_df["ParsedDate"].isna()
-            if mask_unparsed.any():
-                temp_parsed = pd.to_datetime(
-                    full_df.loc[mask_unparsed, "OriginalDate"],
-                    format=fmt,
-                    errors="coerce"
-                )
-                full_df.loc[mask_unparsed, "ParsedDate"] = temp_parsed
-
-    full_df["Date_str"] = full_df["ParsedDate"].dt.strftime("%d-%b-%Y")
-    full_df.loc[full_df["Date_str"].isna(), "Date_str"] = full_df["OriginalDate"].astype(str)
-
-    # 3. Process Throw Columns & PRE-CALCULATE STATS
-    throw_cols = [col for col in full_df.columns if col.startswith("Throw_")]
-
-    # Ensure numeric
-    for c in throw_cols:
-        full_df[c] = pd.to_numeric(full_df[c], errors="coerce")
-
-    # --- Pre-calculate Stats ---
-    # 180s
-    full_df["Count180"] = full_df[throw_cols].isin([180]).sum(axis=1)
-    # 140+
-    full_df["Count140"] = full_df[throw_cols].apply(lambda row: ((row >= 140) & (row < 180)).sum(), axis=1)
-    # 100+
-    full_df["Count100"] = full_df[throw_cols].apply(lambda row: ((row >= 100) & (row < 140)).sum(), axis=1)
-
-    # Calculate Last Throw (Potential Checkout)
-    def get_last_score(row):
-        valid = row[pd.notna(row) & (row > 0)]
-        if not valid.empty:
-            return valid.iloc[-1]
-        return 0
-
-    full_df["LegCheckout"] = full_df[throw_cols].apply(get_last_score, axis=1)
-
-    # --- NEW: Total Darts Handling ---
-    if "Total Darts" in full_df.columns:
-        full_df["Total Darts"] = pd.to_numeric(full_df["Total Darts"], errors="coerce")
-
-    # --- NEW: Total Scored (Sum of all throws) ---
-    full_df["TotalScored"] = full_df[throw_cols].sum(axis=1)
-
-    # --- NEW: First 9 Average Logic ---
-    # Sum of first 3 throws (visits) / 3 (visits) -> This is average score per visit.
-    # To get "3-dart average" for the first 9 darts, it is exactly the average of the first 3 visits.
-    f9_cols = ["Throw_1", "Throw_2", "Throw_3"]
-    # Filter only columns that exist
-    f9_cols = [c for c in f9_cols if c in full_df.columns]
-    full_df["First9Sum"] = full_df[f9_cols].sum(axis=1)
-    full_df["First9Count"] = full_df[f9_cols].count(axis=1)
-    full_df["First9Avg"] = full_df.apply(
-        lambda r: r["First9Sum"] / r["First9Count"] if r["First9Count"] > 0 else np.nan,
-        axis=1
-    )
-
-    # --- NEW: Visit Standard Deviation (Consistency) ---
-    full_df["VisitStdDev"] = full_df[throw_cols].std(axis=1)
-
-    return full_df
+    instrument.cache_miss("load_data")
+    with instrument.stage("load"):
+        full_df, errors = load_with_snapshot(data_folder, get_ingest_cache(), workers=INGEST_WORKERS)
+    with instrument.stage("derive"):
+        dataset = build_dataset(full_df)
+    if not dataset.empty:
+        # Ratings state is kept on disk: only matches not rated yet are applied
+        with instrument.stage("ratings"):
+            dataset.ratings, mode = update_ratings(data_folder, dataset.matches)
+        instrument.cache_event("ratings", hit=mode != "replay")
+    instrument.record_memory({"legs": dataset.legs, "visits": dataset.visits, "matches": dataset.matches})
+    return dataset, errors
+
+# --- Per-tab aggregations ---
+# Cached by (dataset version, selection); the dataset itself is not hashed.
+@st.cache_data(max_entries=256, show_spinner=False)
+def tab_band_counts(version, selection, _dataset):
+    instrument.cache_miss("tab_band_counts")
+    return band_counts(_dataset.cube, selection)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def tab_player_stats(version, selection, _dataset):
+    instrument.cache_miss("tab_player_stats")
+    return cube_player_stats(_dataset.cube, selection)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def tab_distribution(version, selection, _dataset):
+    instrument.cache_miss("tab_distribution")
+    return distribution_table(_dataset, selection)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def tab_form(version, selection, _dataset, _players):
+    instrument.cache_miss("tab_form")
+    return form_table(_dataset, selection.data_type, players=_players)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def tab_player_trend(version, data_type, player, _dataset):
+    instrument.cache_miss("tab_player_trend")
+    return player_trend(_dataset, data_type, player)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def tab_prediction(version, data_type, player, opponent, best_of, seed, _dataset):
+    instrument.cache_miss("tab_prediction")
+    scope = Selection(data_type)
+    return predict_match(player_model(_dataset, player, scope), player_model(_dataset, opponent, scope),
+                         best_of=best_of, seed=seed)
+
+# --- Figures ---
+# Built once per (dataset version, chart, selection key) and shared: st.plotly_chart
+# serializes its own copy, so a cached figure is never modified after it is built.
+# The builder and its inputs are underscore-named so they are not hashed: the key
+# must identify everything the inputs were computed from.
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def cached_figure(version, chart, key, _build, _inputs):
+    instrument.cache_miss("figure")
+    return _build(*_inputs)
 
 # --- Load Data ---
 data_folder = "data"
-full_df = load_data_v4_fix(data_folder)
+with instrument.stage("data"):
+    if WATCH_SECONDS:
+        # Shared and updated in place of reloading: new files are appended to the loaded tables
+        live = get_live_dataset(data_folder)
+        with st.spinner("Loading and processing data..."):
+            live.refresh()
+        dataset, data_version, errors = live.snapshot()
+    else:
+        data_version = folder_signature(data_folder)
+        with instrument.cache_call("load_data"):
+            dataset, errors = load_data_v4_fix(data_folder, data_version)
+    for file, e in errors:
+        st.error(f"Error reading {file}: {e}")
+    # Duplicate and unmirrored leg rows seen by the ingest cache (none after a snapshot load)
+    leg_issues = (live.ingest if WATCH_SECONDS else get_ingest_cache()).issues()
+    if not leg_issues.empty:
+        st.warning("; ".join(summarize_issues(leg_issues)))
+        with st.expander("Leg rows"):
+            st.dataframe(leg_issues, hide_index=True)
+full_df = dataset.legs
 
 if full_df.empty:
     st.warning("No CSV files found in the data folder or folder is missing.")
     st.stop()
 
 # Identify throw columns dynamically
-throw_cols = [col for col in full_df.columns if col.startswith("Throw_")]
+throw_cols = throw_columns(full_df)
 
 if "Player" not in full_df.columns or not throw_cols:
     st.error("CSV files must have 'Player' column and throw columns like 'Throw_1', 'Throw_2'.")
@@ -135,34 +161,26 @@ if "Player" not in full_df.columns or not throw_cols:
 
 # --- SAFETY CHECK: Recalculate if columns missing ---
 if "Count180" not in full_df.columns:
-    full_df["Count180"] = full_df[throw_cols].isin([180]).sum(axis=1)
-    full_df["Count140"] = full_df[throw_cols].apply(lambda row: ((row >= 140) & (row < 180)).sum(), axis=1)
-    full_df["Count100"] = full_df[throw_cols].apply(lambda row: ((row >= 100) & (row < 140)).sum(), axis=1)
-
-    def get_last_score(row):
-        valid = row[pd.notna(row) & (row > 0)]
-        if not valid.empty:
-            return valid.iloc[-1]
-        return 0
-    full_df["LegCheckout"] = full_df[throw_cols].apply(get_last_score, axis=1)
+    full_df = add_leg_stats(full_df.copy(), throw_cols)
 
 # ==========================================
 # SIDEBAR: FILTERS & NAVIGATION
 # ==========================================
-with st.sidebar:
+with st.sidebar, instrument.stage("sidebar"):
     st.header("⚙️ Configuration")
     data_mode = st.radio("Select Competition Type", ["🏆 Grand Prix", "🏅 League"])
 
     st.markdown("---")
 
     # --- Filter Dataset Logic ---
+    # The choices come from the dataset's filter menu (its distinct venues,
+    # seasons, divisions and dates), so no session copies or scans the legs
+    menu = dataset.menu
     if data_mode == "🏆 Grand Prix":
-        active_df = full_df[full_df["DataType"] == "Competition"].copy()
-        active_df["Venue"] = active_df["Venue"].astype(str)
-        active_df["Competition"] = active_df["Venue"] + " - " + active_df["Date_str"]
+        active_menu = menu[menu["DataType"] == "Competition"]
 
         options_df = (
-            active_df[["Competition", "ParsedDate"]]
+            active_menu[["Competition", "ParsedDate"]]
             .drop_duplicates()
             .sort_values("ParsedDate", ascending=False, na_position="last")
             .reset_index(drop=True)
@@ -174,443 +192,510 @@ with st.sidebar:
 
         # Create list and add "All Competitions" option
         comp_list = options_df["Competition"].tolist()
-        comp_list.insert(0, "All Competitions")
+        comp_list.insert(0, ALL_COMPETITIONS)
 
         selected_label = st.selectbox("Select a competition", comp_list)
 
         # --- NEW: Logic for All Competitions ---
-        if selected_label == "All Competitions":
-            filtered_df = active_df.copy()
+        if selected_label == ALL_COMPETITIONS:
+            selection = Selection("Competition")
         else:
-            filtered_df = active_df[active_df["Competition"] == selected_label].copy()
+            selection = Selection("Competition", competition=selected_label)
 
     else:
         # --- LEAGUE DATA PROCESSING ---
-        active_df = full_df[full_df["DataType"] == "League"].copy()
-
-        active_df["Venue"] = active_df.get("Venue", pd.Series(dtype='str')).astype(str)
-        active_df["Season"] = active_df["Season"].astype(str)
-        active_df["Division"] = active_df["Division"].astype(str)
+        active_menu = menu[menu["DataType"] == "League"]
 
         # 1. Select Venue
-        unique_venues = sorted(active_df["Venue"].unique())
+        unique_venues = sorted(active_menu["Venue"].unique())
         if not unique_venues:
             st.warning("No League venues found.")
             st.stop()
         selected_venue = st.selectbox("📍 Select League/Venue", unique_venues)
-        venue_df = active_df[active_df["Venue"] == selected_venue]
+        venue_menu = active_menu[active_menu["Venue"] == selected_venue]
 
         # 2. Select Season
-        unique_seasons = venue_df["Season"].unique()
+        unique_seasons = venue_menu["Season"].unique()
         try:
             unique_seasons = sorted(unique_seasons, key=lambda x: int(x), reverse=True)
         except ValueError:
             unique_seasons = sorted(unique_seasons, reverse=True)
         selected_season = st.selectbox("📅 Select Season", unique_seasons)
-        season_df = venue_df[venue_df["Season"] == selected_season]
+        season_menu = venue_menu[venue_menu["Season"] == selected_season]
 
         # 3. Select Division (With "All Divisions")
-        unique_divisions = sorted(season_df["Division"].unique())
-        unique_divisions.insert(0, "All Divisions")
+        unique_divisions = sorted(season_menu["Division"].unique())
+        unique_divisions.insert(0, ALL_DIVISIONS)
 
         selected_division = st.selectbox("🏆 Select Division", unique_divisions)
 
-        if selected_division == "All Divisions":
-            filtered_df = season_df.copy()
-        else:
-            filtered_df = season_df[season_df["Division"] == selected_division].copy()
+        selection = Selection(
+            "League",
+            venue=selected_venue,
+            season=selected_season,
+            division=None if selected_division == ALL_DIVISIONS else selected_division,
+        )
 
         selected_label = f"{selected_venue} - S{selected_season} - {selected_division}"
 
+    # Players of the selection, from the cube (a mask over its cells, not a copy of the legs)
+    selected_players = dataset.cube.loc[selection.mask(dataset.cube), "Player"].astype(str).unique()
+
+# ==========================================
+# WATCH MODE: PUSH NEW DATA TO THIS SESSION
+# ==========================================
+if WATCH_SECONDS:
+    @st.fragment(run_every=WATCH_SECONDS)
+    def watch_data_folder():
+        """Poll the folder; rerun the whole page once the shared dataset has moved on."""
+        live.refresh()
+        if live.snapshot()[1] != data_version:
+            st.rerun(scope="app")
+        updated = pd.Timestamp.fromtimestamp(live.updated).strftime("%H:%M:%S")
+        st.caption(f"🔴 Live · checking every {WATCH_SECONDS:g}s · data from {updated}")
+
+    with st.sidebar:
+        watch_data_folder()
+
 # ==========================================
 # MAIN PAGE: TABS
 # ==========================================
 
-# Create the tabs
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["🎯 180s", "🎣 Checkouts", "👇 Lowest Legs", "📊 Player Stats", "👤 Individual"])
+# Create the tabs. In lazy mode switching tab reruns the script and only the
+# open tab's body runs, so a click costs one tab's work rather than all five.
+tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    ["🎯 180s", "🎣 Checkouts", "👇 Lowest Legs", "📊 Player Stats", "👤 Individual"],
+    key="tab",
+    on_change="rerun" if LAZY_TABS else "ignore",
+)
+
+def tab_open(tab):
+    """Whether to run a tab's body: only the open one in lazy mode, every one otherwise."""
+    return not LAZY_TABS or tab.open
 
 # ------------------------------------------
 # TAB 1: 180s
 # ------------------------------------------
-with tab1:
-    player_stats = filtered_df.groupby("Player")[["Count180", "Count140", "Count100"]].sum().reset_index()
+with tab1, instrument.stage("tab.180s"):
+    if tab_open(tab1):
+        # Summed from the pre-aggregated cube rather than scanning the legs
+        with instrument.cache_call("tab_band_counts"), instrument.stage("compute"):
+            player_stats = tab_band_counts(data_version, selection, dataset)
 
-    player_stats.rename(columns={
-        "Count180": "180s",
-        "Count140": "140+",
-        "Count100": "100+"
-    }, inplace=True)
+        player_stats.rename(columns={
+            "Count180": "180s",
+            "Count140": "140+",
+            "Count100": "100+"
+        }, inplace=True)
 
-    total_180s = int(player_stats["180s"].sum()) if not player_stats.empty else 0
+        total_180s = int(player_stats["180s"].sum()) if not player_stats.empty else 0
 
-    player_stats = player_stats.sort_values(by=["180s", "140+", "100+"], ascending=[False, False, False])
+        player_stats = player_stats.sort_values(by=["180s", "140+", "100+"], ascending=[False, False, False])
 
-    st.subheader(f"Total 180s - {total_180s}")
-    st.dataframe(player_stats, hide_index=True)
+        st.subheader(f"Total 180s - {total_180s}")
+        st.dataframe(player_stats, hide_index=True)
 
-    # --- Bottom Chart Section ---
-    overall_df = active_df.copy()
-    st.markdown("---")
+        # --- Bottom Chart Section ---
+        st.markdown("---")
 
-    if data_mode == "🏅 League":
-        comp_group = overall_df.groupby(["Player", "Venue", "Division", "Season"])["Count180"].sum().reset_index()
-        comp_group.rename(columns={"Count180": "180s"}, inplace=True)
-        comp_group = comp_group.sort_values("180s", ascending=False).head(5).reset_index(drop=True)
-
-        st.subheader("**Most 180s in a League Season**")
-
-        if not comp_group.empty:
-            chart_data = comp_group.copy()
-            chart_data['Unique_ID'] = chart_data['Player'] + '_' + chart_data['Season'].astype(str)
-            chart_data = chart_data.iloc[::-1].reset_index(drop=True)
-
-            fig = go.Figure(go.Bar(
-                x=chart_data["180s"],
-                y=chart_data["Unique_ID"],
-                orientation='h',
-                text=chart_data["180s"],
-                textposition='outside',
-                hovertemplate='<b>%{customdata[0]}</b><br>' +
-                              '180s: %{x}<br>' +
-                              'Venue: %{customdata[1]}<br>' +
-                              'Division: %{customdata[2]}<br>' +
-                              'Season: %{customdata[3]}<extra></extra>',
-                customdata=chart_data[["Player", "Venue", "Division", "Season"]].values,
-                marker=dict(color='#1f77b4')
-            ))
-            fig.update_yaxes(ticktext=chart_data["Player"], tickvals=chart_data["Unique_ID"])
-            fig.update_layout(
-                xaxis_title="", xaxis=dict(showticklabels=False, showgrid=False),
-                yaxis_title="", height=300, margin=dict(l=20, r=20, t=20, b=20),
-                showlegend=False
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No 180s recorded in League data.")
+        if data_mode == "🏅 League":
+            comp_group = dataset.leaderboards.most_180s("League", 5).reset_index(drop=True)
 
-    else:
-        # Grand Prix Logic
-        comp_group = overall_df.groupby(["Player", "Venue", "Date_str"])["Count180"].sum().reset_index()
-        comp_group.rename(columns={"Count180": "180s"}, inplace=True)
-        comp_group = comp_group.sort_values(["180s"], ascending=False).head(5).reset_index(drop=True)
-        comp_group.rename(columns={"Date_str": "Date"}, inplace=True)
-
-        st.subheader("**Most 180s in a Grand Prix**")
-
-        if not comp_group.empty:
-            chart_data = comp_group.copy()
-            chart_data['Unique_ID'] = chart_data['Player'] + '_' + chart_data['Date']
-            chart_data = chart_data.iloc[::-1].reset_index(drop=True)
-
-            fig = go.Figure(go.Bar(
-                x=chart_data["180s"],
-                y=chart_data["Unique_ID"],
-                orientation='h',
-                text=chart_data["180s"],
-                textposition='outside',
-                hovertemplate='<b>%{customdata[0]}</b><br>' +
-                              '180s: %{x}<br>' +
-                              'Venue: %{customdata[1]}<br>' +
-                              'Date: %{customdata[2]}<extra></extra>',
-                customdata=chart_data[["Player", "Venue", "Date"]].values,
-                marker=dict(color='#1f77b4')
-            ))
-            fig.update_yaxes(ticktext=chart_data["Player"], tickvals=chart_data["Unique_ID"])
-            fig.update_layout(
-                xaxis_title="", xaxis=dict(showticklabels=False, showgrid=False),
-                yaxis_title="", height=300, margin=dict(l=20, r=20, t=20, b=20),
-                showlegend=False
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-             st.info("No 180s recorded in Grand Prix data.")
+            st.subheader("**Most 180s in a League Season**")
 
-# ------------------------------------------
-# TAB 2: Checkouts
-# ------------------------------------------
-with tab2:
-    winners_df = filtered_df[filtered_df["Result"].str.upper() == "WON"].copy()
+            if not comp_group.empty:
+                chart_data = comp_group.copy()
+                chart_data['Unique_ID'] = chart_data['Player'].astype(str) + '_' + chart_data['Season'].astype(str)
+                chart_data = chart_data.iloc[::-1].reset_index(drop=True)
 
-    if winners_df.empty:
-        st.info("No winning legs found — cannot calculate checkouts.")
-    else:
-        winners_df = winners_df[winners_df["LegCheckout"] > 0]
+                with instrument.cache_call("figure"), instrument.stage("figure"):
+                    fig = cached_figure(data_version, "most_180s", "League", most_180s_figure,
+                                        (chart_data, ["Player", "Venue", "Division", "Season"]))
+                    st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("No 180s recorded in League data.")
 
-        cols_to_keep = ["Player", "LegCheckout"]
-        if "URL" in winners_df.columns: cols_to_keep.append("URL")
+        else:
+            # Grand Prix Logic
+            comp_group = dataset.leaderboards.most_180s("Competition", 5).reset_index(drop=True)
+            comp_group.rename(columns={"Date_str": "Date"}, inplace=True)
 
-        top5_checkouts = winners_df[cols_to_keep]
-        top5_checkouts.rename(columns={"LegCheckout": "Checkout"}, inplace=True)
+            st.subheader("**Most 180s in a Grand Prix**")
 
-        top5_checkouts = top5_checkouts.sort_values("Checkout", ascending=False).head(5).reset_index(drop=True)
+            if not comp_group.empty:
+                chart_data = comp_group.copy()
+                chart_data['Unique_ID'] = chart_data['Player'].astype(str) + '_' + chart_data['Date'].astype(str)
+                chart_data = chart_data.iloc[::-1].reset_index(drop=True)
 
-        st.subheader(f"Highest Checkouts")
+                with instrument.cache_call("figure"), instrument.stage("figure"):
+                    fig = cached_figure(data_version, "most_180s", "Competition", most_180s_figure,
+                                        (chart_data, ["Player", "Venue", "Date"]))
+                    st.plotly_chart(fig, use_container_width=True)
+            else:
+                 st.info("No 180s recorded in Grand Prix data.")
 
-        column_config = {}
-        if "URL" in top5_checkouts.columns:
-            column_config["URL"] = st.column_config.LinkColumn("Match Link", display_text="View Match")
+# ------------------------------------------
+# TAB 2: Checkouts
+# ------------------------------------------
+with tab2, instrument.stage("tab.checkouts"):
+    if tab_open(tab2):
+        # Served from the leaderboard index built at load, not a scan of the legs
+        leaderboards = dataset.leaderboards
+        top5_checkouts = leaderboards.top("checkouts", selection, 5)
+
+        if top5_checkouts.empty:
+            st.info("No winning legs found — cannot calculate checkouts.")
+        else:
+            top5_checkouts = top5_checkouts[["Player", "LegCheckout", "URL"]]
+            top5_checkouts.rename(columns={"LegCheckout": "Checkout"}, inplace=True)
 
-        st.dataframe(top5_checkouts, column_config=column_config, hide_index=True)
+            st.subheader(f"Highest Checkouts")
 
-    # --- 170 Club ---
-    st.markdown("---")
-    st.markdown("## 🎣 The Big Fish")
+            column_config = {}
+            if "URL" in top5_checkouts.columns:
+                column_config["URL"] = st.column_config.LinkColumn("Match Link", display_text="View Match")
 
-    winners_all = active_df[active_df["Result"].str.upper() == "WON"].copy()
-    winners_all = winners_all[winners_all["LegCheckout"] == 170]
+            st.dataframe(top5_checkouts, column_config=column_config, hide_index=True)
 
-    if data_mode == "🏅 League":
-        cols_170 = ["Player", "Division", "Season"]
-        if "URL" in winners_all.columns: cols_170.append("URL")
-        max_170_df = winners_all[cols_170].drop_duplicates()
-        max_170_df = max_170_df.sort_values(by="Season", ascending=False).reset_index(drop=True)
-    else:
-        cols_gp = ["Player", "Venue", "Date_str", "ParsedDate"]
-        if "URL" in winners_all.columns: cols_gp.append("URL")
-        max_170_df = winners_all[cols_gp].drop_duplicates()
-        max_170_df = max_170_df.sort_values("ParsedDate", ascending=False, na_position="last").reset_index(drop=True)
-
-        cols_display = ["Player", "Venue", "Date_str"]
-        if "URL" in max_170_df.columns: cols_display.append("URL")
-        max_170_df = max_170_df[cols_display]
-        max_170_df.rename(columns={"Date_str":"Date"}, inplace=True)
-
-    if not max_170_df.empty:
-        cfg_170 = {}
-        if "URL" in max_170_df.columns:
-            cfg_170["URL"] = st.column_config.LinkColumn("Match Link", display_text="View Match")
-        st.dataframe(max_170_df, column_config=cfg_170, hide_index=True)
-    else:
-        st.info("No 170 checkouts recorded.")
+        # --- 170 Club ---
+        st.markdown("---")
+        st.markdown("## 🎣 The Big Fish")
+
+        winners_all = leaderboards.top("big_fish", Selection(selection.data_type))
+
+        if data_mode == "🏅 League":
+            cols_170 = ["Player", "Division", "Season", "URL"]
+            max_170_df = winners_all[cols_170].drop_duplicates()
+            max_170_df = max_170_df.sort_values(by="Season", ascending=False).reset_index(drop=True)
+        else:
+            cols_gp = ["Player", "Venue", "Date_str", "URL"]
+            max_170_df = winners_all[cols_gp].drop_duplicates().reset_index(drop=True)
+            max_170_df.rename(columns={"Date_str":"Date"}, inplace=True)
+
+        if not max_170_df.empty:
+            cfg_170 = {}
+            if "URL" in max_170_df.columns:
+                cfg_170["URL"] = st.column_config.LinkColumn("Match Link", display_text="View Match")
+            st.dataframe(max_170_df, column_config=cfg_170, hide_index=True)
+        else:
+            st.info("No 170 checkouts recorded.")
 
 # ------------------------------------------
 # TAB 3: Lowest Legs
 # ------------------------------------------
-with tab3:
-    winners_df = filtered_df[filtered_df["Result"].str.upper() == "WON"].copy()
-    winners_overall = active_df[active_df["Result"].str.upper() == "WON"].copy()
-
-    # Selected Competition
-    if winners_df.empty:
-        st.info("No winning legs found for this selection.")
-    else:
-        winners_df["Total Darts"] = pd.to_numeric(winners_df["Total Darts"], errors="coerce")
-
-        lowest_per_player = winners_df.sort_values(["Total Darts", "LegCheckout"], ascending=[True, False])
-        lowest_per_player = lowest_per_player.groupby("Player", as_index=False).first()
-        lowest_per_player = lowest_per_player.sort_values(["Total Darts", "LegCheckout"], ascending=[True, False])
-
-        cols_to_keep = ["Player", "Total Darts"]
-        if "URL" in lowest_per_player.columns: cols_to_keep.append("URL")
+with tab3, instrument.stage("tab.lowest_legs"):
+    if tab_open(tab3):
+        # Selected Competition
+        lowest_per_player = dataset.leaderboards.top("lowest_legs", selection, 5)
 
-        top5_lowest = lowest_per_player[cols_to_keep].head(5).reset_index(drop=True)
-        top5_lowest.rename(columns={"Total Darts":"Darts Thrown"}, inplace=True)
+        if lowest_per_player.empty:
+            st.info("No winning legs found for this selection.")
+        else:
+            top5_lowest = lowest_per_player[["Player", "Total Darts", "URL"]]
+            top5_lowest.rename(columns={"Total Darts":"Darts Thrown"}, inplace=True)
 
-        st.subheader(f"Lowest Legs — {selected_label}")
+            st.subheader(f"Lowest Legs — {selected_label}")
 
-        column_config = {}
-        if "URL" in top5_lowest.columns:
-            column_config["URL"] = st.column_config.LinkColumn("Match Link", display_text="View Match")
+            column_config = {}
+            if "URL" in top5_lowest.columns:
+                column_config["URL"] = st.column_config.LinkColumn("Match Link", display_text="View Match")
 
-        st.dataframe(top5_lowest, column_config=column_config, hide_index=True)
+            st.dataframe(top5_lowest, column_config=column_config, hide_index=True)
 
-    # Overall Lowest Legs
-    st.markdown("---")
-    if winners_overall.empty:
-        st.info("No winning legs found overall.")
-    else:
-        winners_overall["Total Darts"] = pd.to_numeric(winners_overall["Total Darts"], errors="coerce")
-        all_lowest = winners_overall.sort_values(["Total Darts", "LegCheckout"], ascending=[True,False])
+        # Overall Lowest Legs
+        st.markdown("---")
+        all_lowest = dataset.leaderboards.top("fastest_legs", Selection(selection.data_type), 5)
 
-        if data_mode == "🏅 League":
-            cols = ["Player", "Total Darts", "Venue", "Division", "Season"]
-            ll_table_title = "**Lowest Leg in a League Season**"
+        if all_lowest.empty:
+            st.info("No winning legs found overall.")
         else:
-            cols = ["Player", "Total Darts", "Venue", "Date_str"]
-            ll_table_title = "**Lowest Leg in a Grand Prix**"
+            if data_mode == "🏅 League":
+                cols = ["Player", "Total Darts", "Venue", "Division", "Season"]
+                ll_table_title = "**Lowest Leg in a League Season**"
+            else:
+                cols = ["Player", "Total Darts", "Venue", "Date_str"]
+                ll_table_title = "**Lowest Leg in a Grand Prix**"
 
-        if "URL" in all_lowest.columns: cols.append("URL")
+            cols.append("URL")
 
-        top5_overall = all_lowest[cols].head(5).reset_index(drop=True)
-        top5_overall.rename(columns={"Total Darts":"Darts Thrown", "Date_str":"Date"}, inplace=True)
+            top5_overall = all_lowest[cols]
+            top5_overall.rename(columns={"Total Darts":"Darts Thrown", "Date_str":"Date"}, inplace=True)
 
-        st.subheader(ll_table_title)
+            st.subheader(ll_table_title)
 
-        column_config = {}
-        if "URL" in top5_overall.columns:
-            column_config["URL"] = st.column_config.LinkColumn("Match Link", display_text="View Match")
+            column_config = {}
+            if "URL" in top5_overall.columns:
+                column_config["URL"] = st.column_config.LinkColumn("Match Link", display_text="View Match")
 
-        st.dataframe(top5_overall, column_config=column_config, hide_index=True)
+            st.dataframe(top5_overall, column_config=column_config, hide_index=True)
 
 # ------------------------------------------
 # TAB 4: PLAYER STATS (Updated)
 # ------------------------------------------
-with tab4:
-    st.header(f"Player Stats: {selected_label}")
-
-    # Need to aggregate Legs into Matches to calculate Match Win %
-    # Group by URL (unique match) and Player
-    # Columns needed: URL, Player, Result (Legs)
-
-    if not filtered_df.empty:
-        # 1. Aggregate to Player-Match Level to count Match Wins
-        # For each match (URL), count legs won vs legs lost
-        match_level = filtered_df.groupby(["Player", "URL", "Opponent"]).apply(
-            lambda x: pd.Series({
-                "LegsWon": (x["Result"].str.upper() == "WON").sum(),
-                "LegsLost": (x["Result"].str.upper() == "LOST").sum(),
-                "LegsPlayed": len(x)
-            })
-        ).reset_index()
-
-        # Determine Match Result
-        def determine_match_result(row):
-            if row["LegsWon"] > row["LegsLost"]:
-                return "WON"
-            elif row["LegsWon"] < row["LegsLost"]:
-                return "LOST"
-            else:
-                return "DRAW"
-
-        match_level["MatchResult"] = match_level.apply(determine_match_result, axis=1)
-
-        # 2. Group by Player to get Overall Stats
-        player_agg = filtered_df.groupby("Player").apply(
-            lambda x: pd.Series({
-                "TotalScore": x["TotalScored"].sum(),
-                "TotalDarts": x["Total Darts"].sum(),
-                "AvgFirst9": x["First9Avg"].mean(),
-                "TotalLegsPlayed": len(x),
-                "TotalLegsWon": (x["Result"].str.upper() == "WON").sum()
-            })
-        ).reset_index()
-
-        # Join with Match Stats
-        match_agg = match_level.groupby("Player").apply(
-            lambda x: pd.Series({
-                "MatchesPlayed": len(x),
-                "MatchesWon": (x["MatchResult"] == "WON").sum()
-            })
-        ).reset_index()
-
-        final_stats = pd.merge(player_agg, match_agg, on="Player")
-
-        # Calculations
-        final_stats["3DartAvg"] = final_stats.apply(
-            lambda r: (r["TotalScore"] / r["TotalDarts"]) * 3 if r["TotalDarts"] > 0 else 0, axis=1
-        )
-        final_stats["MatchWin%"] = (final_stats["MatchesWon"] / final_stats["MatchesPlayed"]) * 100
-        final_stats["LegWin%"] = (final_stats["TotalLegsWon"] / final_stats["TotalLegsPlayed"]) * 100
-
-        display_stats = final_stats[[
-            "Player", "MatchesPlayed", "MatchesWon", "MatchWin%",
-            "LegWin%", "3DartAvg", "AvgFirst9"
-        ]].copy()
+with tab4, instrument.stage("tab.player_stats"):
+    if tab_open(tab4):
+        st.header(f"Player Stats: {selected_label}")
+
+        # Match results and leg totals come from the pre-aggregated player cube,
+        # so any selection is a sum over its cells rather than a scan of the legs.
+
+        if len(selected_players):
+            with instrument.cache_call("tab_player_stats"), instrument.stage("compute"):
+                final_stats = tab_player_stats(data_version, selection, dataset)
+
+            display_stats = with_ratings(final_stats, dataset, selection.data_type)[[
+                "Player", "MatchesPlayed", "MatchesWon", "MatchWin%",
+                "LegWin%", "3DartAvg", "AvgFirst9", "Rating"
+            ]].copy()
+
+            display_stats = display_stats.sort_values("3DartAvg", ascending=False).reset_index(drop=True)
+
+            st.dataframe(
+                display_stats,
+                column_config={
+                    "MatchWin%": st.column_config.ProgressColumn("Match Win %", format="%.1f%%", min_value=0, max_value=100),
+                    "LegWin%": st.column_config.NumberColumn("Leg Win %", format="%.1f%%"),
+                    "3DartAvg": st.column_config.NumberColumn("3-Dart Avg", format="%.2f"),
+                    "AvgFirst9": st.column_config.NumberColumn("First 9 Avg", format="%.2f"),
+                    "Rating": st.column_config.NumberColumn("Rating", format="%.0f"),
+                },
+                hide_index=True
+            )
 
-        display_stats = display_stats.sort_values("3DartAvg", ascending=False).reset_index(drop=True)
+            # Visit score distributions are sums of the per-cell 0-180 histograms
+            st.subheader("🎯 Visit Score Distribution")
+            with instrument.cache_call("tab_distribution"), instrument.stage("compute"):
+                distribution = tab_distribution(data_version, selection, dataset)
+
+            st.dataframe(
+                distribution,
+                column_config={
+                    "MeanVisit": st.column_config.NumberColumn("Mean Visit", format="%.2f"),
+                    "P10": st.column_config.NumberColumn("10th %", format="%.0f"),
+                    "P25": st.column_config.NumberColumn("25th %", format="%.0f"),
+                    "Median": st.column_config.NumberColumn("Median", format="%.0f"),
+                    "P75": st.column_config.NumberColumn("75th %", format="%.0f"),
+                    "P90": st.column_config.NumberColumn("90th %", format="%.0f"),
+                    "IQR": st.column_config.NumberColumn("IQR", format="%.0f"),
+                    "VisitStd": st.column_config.NumberColumn("Visit Std Dev", format="%.2f"),
+                    "Count26": st.column_config.NumberColumn("26s"),
+                    "26%": st.column_config.NumberColumn("26 %", format="%.1f%%"),
+                },
+                hide_index=True
+            )
 
-        st.dataframe(
-            display_stats,
-            column_config={
-                "MatchWin%": st.column_config.ProgressColumn("Match Win %", format="%.1f%%", min_value=0, max_value=100),
-                "LegWin%": st.column_config.NumberColumn("Leg Win %", format="%.1f%%"),
-                "3DartAvg": st.column_config.NumberColumn("3-Dart Avg", format="%.2f"),
-                "AvgFirst9": st.column_config.NumberColumn("First 9 Avg", format="%.2f"),
-            },
-            hide_index=True
-        )
-    else:
-        st.info("No data available.")
+            # Recent form over each player's whole history, for the players in this selection
+            st.subheader("🔥 Current Form")
+            st.caption(f"Last {FORM_LEGS} legs and last {FORM_MATCHES} matches; players with at least {FORM_LEGS} legs.")
+            with instrument.cache_call("tab_form"), instrument.stage("compute"):
+                form = tab_form(data_version, selection, dataset, selected_players)
+
+            st.dataframe(
+                form,
+                column_config={
+                    "3DartAvg": st.column_config.NumberColumn("Career Avg", format="%.2f"),
+                    "LastLegsAvg": st.column_config.NumberColumn(f"Last {FORM_LEGS} Legs", format="%.2f"),
+                    "LastMatchesAvg": st.column_config.NumberColumn(f"Last {FORM_MATCHES} Matches", format="%.2f"),
+                    "EWAvg": st.column_config.NumberColumn("Weighted Avg", format="%.2f"),
+                    "Form": st.column_config.NumberColumn("Form", format="%+.2f"),
+                },
+                hide_index=True
+            )
+        else:
+            st.info("No data available.")
 
 # ------------------------------------------
 # TAB 5: INDIVIDUAL (New)
 # ------------------------------------------
-with tab5:
-    st.header("👤 Individual Player Analysis")
+with tab5, instrument.stage("tab.individual"):
+    if tab_open(tab5):
+        st.header("👤 Individual Player Analysis")
 
-    player_list = sorted(filtered_df["Player"].unique())
-    selected_player = st.selectbox("Select Player", player_list)
+        player_list = sorted(selected_players)
+        selected_player = st.selectbox("Select Player", player_list)
 
-    # 1. Performance Over Time (Avg Only)
-    st.subheader("📈 Average Over Time")
+        # 1. Performance Over Time (Avg Only)
+        st.subheader("📈 Average Over Time")
 
-    player_history = active_df[active_df["Player"] == selected_player].copy()
+        if data_mode == "🏆 Grand Prix":
+            time_col = "ParsedDate"
+            time_label = "Date"
+        else:
+            time_col = "Season"
+            time_label = "Season"
 
-    if data_mode == "🏆 Grand Prix":
-        time_col = "ParsedDate"
-        time_label = "Date"
-        player_history = player_history.sort_values("ParsedDate")
-    else:
-        time_col = "Season"
-        time_label = "Season"
-        player_history = player_history.sort_values("Season")
-
-    trend_df = player_history.groupby(time_col).apply(
-        lambda x: pd.Series({
-            "3DartAvg": (x["TotalScored"].sum() / x["Total Darts"].sum()) * 3 if x["Total Darts"].sum() > 0 else 0
-        })
-    ).reset_index()
-
-    if not trend_df.empty:
-        fig_trend = go.Figure()
-        fig_trend.add_trace(go.Scatter(
-            x=trend_df[time_col], y=trend_df["3DartAvg"],
-            name="3-Dart Avg", mode='lines+markers', line=dict(color='blue')
-        ))
-        fig_trend.update_layout(
-            xaxis_title=time_label,
-            yaxis_title="3-Dart Avg",
-            margin=dict(l=20, r=20, t=20, b=20)
-        )
-        st.plotly_chart(fig_trend, use_container_width=True)
-    else:
-        st.info("Not enough history for trend analysis.")
+        with instrument.cache_call("tab_player_trend"), instrument.stage("compute"):
+            trend_df = tab_player_trend(data_version, selection.data_type, selected_player, dataset)
+
+        if not trend_df.empty:
+            with instrument.cache_call("figure"), instrument.stage("figure"):
+                fig_trend = cached_figure(data_version, "trend", (selection.data_type, selected_player), trend_figure,
+                                          (trend_df, time_col, time_label))
+                st.plotly_chart(fig_trend, use_container_width=True)
+        else:
+            st.info("Not enough history for trend analysis.")
+
+        # Rolling form: every window is a difference of the player's running totals
+        rolling = dataset.trends.rolling(selected_player, selection.data_type)
+        if len(rolling) > 1:
+            form_row = dataset.trends.form(selection.data_type, players=[selected_player]).iloc[0]
+            c1, c2, c3 = st.columns(3)
+            c1.metric(f"Last {FORM_LEGS} Legs", f"{form_row['LastLegsAvg']:.2f}", delta=f"{form_row['Form']:+.2f} vs career")
+            c2.metric(f"Last {FORM_MATCHES} Matches", f"{form_row['LastMatchesAvg']:.2f}")
+            c3.metric("Weighted Avg", f"{form_row['EWAvg']:.2f}")
+
+            with instrument.cache_call("figure"), instrument.stage("figure"):
+                fig_rolling = cached_figure(data_version, "rolling", (selection.data_type, selected_player),
+                                            rolling_figure, (rolling,))
+                st.plotly_chart(fig_rolling, use_container_width=True)
+
+        st.markdown("---")
+
+        # 2. Rating (Elo over the player's matches, chronological)
+        st.subheader("🏅 Rating")
+
+        rating_history = dataset.ratings.player_history(selected_player, selection.data_type) if dataset.ratings else None
+
+        if rating_history is not None and not rating_history.empty:
+            ratings_table = dataset.ratings.table(selection.data_type)
+            rank = int(ratings_table.index[ratings_table["Player"] == selected_player][0]) + 1
+            st.metric(
+                f"Rating (#{rank} of {len(ratings_table)})",
+                f"{rating_history['Rating'].iloc[-1]:.0f}",
+                delta=f"{rating_history['Change'].iloc[-1]:+.1f} last match",
+            )
+
+            with instrument.cache_call("figure"), instrument.stage("figure"):
+                fig_rating = cached_figure(data_version, "rating", (selection.data_type, selected_player),
+                                           rating_figure, (rating_history,))
+                st.plotly_chart(fig_rating, use_container_width=True)
+        else:
+            st.info("No rated matches for this player.")
+
+        st.markdown("---")
+
+        # 3. Visit scores in the current selection (from the 0-180 histograms)
+        st.subheader("🎯 Visit Scores")
+
+        visit_counts = dataset.histograms.player(selected_player, selection)
 
+        if visit_counts.sum() > 0:
+            player_distribution = tab_distribution(data_version, selection, dataset)
+            row = player_distribution[player_distribution["Player"] == selected_player].iloc[0]
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Median Visit", f"{row['Median']:.0f}")
+            c2.metric("Middle 50%", f"{row['P25']:.0f} – {row['P75']:.0f}")
+            c3.metric("Visit Std Dev", f"{row['VisitStd']:.1f}")
+            c4.metric("26s", f"{int(row['Count26'])}", delta=f"{row['26%']:.1f}% of visits", delta_color="off")
+
+            with instrument.cache_call("figure"), instrument.stage("figure"):
+                fig_visits = cached_figure(data_version, "visits", (selection, selected_player), visits_figure,
+                                           (visit_counts,))
+                st.plotly_chart(fig_visits, use_container_width=True)
+        else:
+            st.info("No visits recorded for this player.")
+
+        st.markdown("---")
+
+        # 4. Head-to-Head (Matches Won)
+        st.subheader("⚔️ Head-to-Head (Matches Won)")
+
+        # Opponent records come from the head-to-head index built at load time
+        rivals = dataset.h2h.rivals(selected_player, selection.data_type)
+
+        if not rivals.empty:
+            # Sort by Matches Won desc
+            rivals = rivals.sort_values("MatchesWon", ascending=False).head(20)
+
+            with instrument.cache_call("figure"), instrument.stage("figure"):
+                fig_h2h = cached_figure(data_version, "h2h", (selection.data_type, selected_player), h2h_figure,
+                                        (rivals, selected_player))
+                st.plotly_chart(fig_h2h, use_container_width=True)
+        else:
+            st.info("No opponent data available.")
+
+        st.markdown("---")
+
+        # 5. Match predictor: simulated legs drawn from both players' legs and visit scores
+        st.subheader("🔮 Match Predictor")
+
+        opponents = [p for p in player_list if p != selected_player]
+        if opponents:
+            c1, c2, c3 = st.columns(3)
+            opponent = c1.selectbox("Opponent", opponents)
+            best_of = c2.selectbox("Best of (legs)", BEST_OF, index=BEST_OF.index(5))
+            seed = c3.number_input("Seed", min_value=0, value=0, step=1, help="The same seed gives the same result")
+
+            with instrument.cache_call("tab_prediction"), instrument.stage("compute"):
+                try:
+                    prediction = tab_prediction(data_version, selection.data_type, selected_player, opponent,
+                                                best_of, int(seed), dataset)
+                except ValueError as e:
+                    prediction = None
+                    st.info(str(e))
+
+            if prediction is not None:
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric(f"{selected_player} Wins", f"{prediction.win[0]:.1%}")
+                c2.metric(f"{opponent} Wins", f"{prediction.win[1]:.1%}")
+                c3.metric("Expected Legs", f"{prediction.expected_legs[0]:.2f} – {prediction.expected_legs[1]:.2f}")
+                c4.metric("Darts per Leg", f"{prediction.expected_darts[0]:.1f} – {prediction.expected_darts[1]:.1f}")
+
+                with instrument.cache_call("figure"), instrument.stage("figure"):
+                    fig_scorelines = cached_figure(
+                        data_version, "scorelines", (selection.data_type, selected_player, opponent, best_of, int(seed)),
+                        scoreline_figure, (prediction.scorelines, prediction.players)
+                    )
+                    st.plotly_chart(fig_scorelines, use_container_width=True)
+                st.caption(f"{prediction.matches:,} simulated best-of-{best_of} matches from every "
+                           f"{data_mode.split(' ', 1)[1]} leg and visit of both players.")
+        else:
+            st.info("No other players in this selection.")
+
+# ==========================================
+# DEBUG: TIMINGS PANEL & STRUCTURED LOG
+# ==========================================
+with st.sidebar:
     st.markdown("---")
+    show_timings = st.toggle("🛠 Show timings", value=os.environ.get("IDL_DEBUG") == "1")
 
-    # 2. Head-to-Head (Matches Won)
-    st.subheader("⚔️ Head-to-Head (Matches Won)")
-
-    # Filter for selected player legs
-    h2h_df = active_df[active_df["Player"] == selected_player].copy()
-
-    if not h2h_df.empty and "Opponent" in h2h_df.columns:
-        # Need to aggregate to MATCH level first
-        match_outcomes = h2h_df.groupby(["URL", "Opponent"]).apply(
-            lambda x: pd.Series({
-                "LegsWon": (x["Result"].str.upper() == "WON").sum(),
-                "LegsLost": (x["Result"].str.upper() == "LOST").sum()
-            })
-        ).reset_index()
-
-        def get_outcome(r):
-            if r["LegsWon"] > r["LegsLost"]: return "WON"
-            elif r["LegsWon"] < r["LegsLost"]: return "LOST"
-            else: return "DRAW"
-
-        match_outcomes["Result"] = match_outcomes.apply(get_outcome, axis=1)
-
-        # Now group by Opponent to count Matches Won
-        rivals = match_outcomes.groupby("Opponent").apply(
-            lambda x: pd.Series({
-                "MatchesPlayed": len(x),
-                "MatchesWon": (x["Result"] == "WON").sum(),
-                "MatchesLost": (x["Result"] == "LOST").sum(),
-                "MatchesDrawn": (x["Result"] == "DRAW").sum()
-            })
-        ).reset_index()
-
-        # Sort by Matches Won desc
-        rivals = rivals.sort_values("MatchesWon", ascending=False).head(20)
-
-        fig_h2h = px.bar(
-            rivals,
-            x="Opponent",
-            y=["MatchesWon", "MatchesLost", "MatchesDrawn"],
-            title=f"Head-to-Head: {selected_player} (Matches)",
-            barmode='stack',
-            color_discrete_map={"MatchesWon": "green", "MatchesLost": "red", "MatchesDrawn": "gray"}
+if show_timings:
+    with st.sidebar.expander("🛠 Timings", expanded=True):
+        st.caption(f"This rerun: {run_timings.total * 1000:.0f} ms")
+        st.dataframe(
+            pd.DataFrame({
+                "Stage": list(run_timings.stages),
+                "ms": [seconds * 1000 for seconds in run_timings.stages.values()],
+                "Calls": [run_timings.calls[stage] for stage in run_timings.stages],
+            }),
+            column_config={"ms": st.column_config.NumberColumn(format="%.1f")},
+            hide_index=True
         )
-        st.plotly_chart(fig_h2h, use_container_width=True)
-    else:
-        st.info("No opponent data available.")
+
+        st.caption("Cache hits / misses (this rerun · since server start)")
+        totals = instrument.cache_totals()
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "Cache": cache,
+                    "Hits": run_timings.cache[f"{cache}.hit"],
+                    "Misses": run_timings.cache[f"{cache}.miss"],
+                    "Total hits": counts["hit"],
+                    "Total misses": counts["miss"],
+                }
+                for cache, counts in sorted(totals.items())
+            ]),
+            hide_index=True
+        )
+
+        st.caption("Memory")
+        st.dataframe(
+            pd.DataFrame([
+                {"Table": table, "MB": size / 2**20}
+                for table, size in dataset.memory_usage().items()
+            ]),
+            column_config={"MB": st.column_config.NumberColumn(format="%.2f")},
+            hide_index=True
+        )
+
+instrument.emit(run_timings, data_mode=selection.data_type, selection=selection.label, tab=st.session_state.get("tab"))
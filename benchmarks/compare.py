@@ -0,0 +1,44 @@
+import argparse
+import json
+
+
+def load_stages(path):
+    """{(scale, stage): seconds} from a benchmark report."""
+    with open(path) as f:
+        report = json.load(f)
+    stages = {}
+    for run in report["runs"]:
+        key = run["scale"] if run["scale"] is not None else run["data"]
+        for stage, seconds in run["stages"].items():
+            stages[(key, stage)] = seconds
+    return report, stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports stage by stage.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="flag stages at least this many times slower (default: 1.2)")
+    args = parser.parse_args(argv)
+
+    base_report, base = load_stages(args.baseline)
+    cand_report, cand = load_stages(args.candidate)
+    print(f"baseline  {base_report.get('commit')}  {base_report['created']}")
+    print(f"candidate {cand_report.get('commit')}  {cand_report['created']}")
+    print(f"{'scale':>8}  {'stage':<28} {'baseline ms':>12} {'candidate ms':>13} {'ratio':>7}")
+
+    regressions = 0
+    for key in sorted(base.keys() & cand.keys(), key=str):
+        scale, stage = key
+        ratio = cand[key] / base[key] if base[key] > 0 else float("inf")
+        flag = ""
+        if ratio >= args.threshold and not stage.endswith(".max"):
+            flag = "  <-- slower"
+            regressions += 1
+        print(f"{scale!s:>8}  {stage:<28} {base[key] * 1000:12.2f} {cand[key] * 1000:13.2f} {ratio:7.2f}{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
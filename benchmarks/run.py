@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import ArchiveGenerator
+from idl_stats.cube import build_player_cube
+from idl_stats.dataset import build_dataset, extend_dataset
+from idl_stats.export import scope_tables
+from idl_stats.h2h import build_h2h_index
+from idl_stats.histograms import build_visit_histograms
+from idl_stats.ingest import IngestCache, list_csv_files
+from idl_stats.leaderboards import build_leaderboards
+from idl_stats.matches import build_match_table
+from idl_stats.predict import SIM_LEGS, player_model, predict_match
+from idl_stats.ratings import RatingEngine
+from idl_stats.report import (
+    band_table, distribution_table, form_table, h2h_table, player_stats_table, player_trend, sql_band_table,
+    sql_player_stats_table,
+)
+from idl_stats.selection import Selection, competition_labels
+from idl_stats.sqlstore import SQLITE_FILE, SqliteStore
+from idl_stats.store import SnapshotStore
+from idl_stats.trends import build_trend_index
+from idl_stats.visits import build_visit_table
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Selections timed per tab (beyond the two "all" selections)
+MAX_SELECTIONS = 20
+
+
+def timed(fn, *args, repeat=1, **kwargs):
+    """Run fn `repeat` times; return (last result, best wall time in seconds)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def sample_selections(legs, limit=MAX_SELECTIONS):
+    """Both "all" selections plus up to `limit` single competitions / league divisions."""
+    selections = [Selection("Competition"), Selection("League")]
+
+    gp = legs[legs["DataType"] == "Competition"]
+    labels = pd.unique(competition_labels(gp))
+    selections += [Selection("Competition", competition=label) for label in labels[: limit // 2]]
+
+    league = legs[legs["DataType"] == "League"][["Venue", "Season", "Division"]].astype(str).drop_duplicates()
+    for venue, season, division in league.head(limit // 2).itertuples(index=False):
+        selections.append(Selection("League", venue=venue, season=season))
+        selections.append(Selection("League", venue=venue, season=season, division=division))
+    return selections
+
+
+def time_tabs(dataset, selections, repeat):
+    """Mean and worst time per tab over the sampled selections."""
+    boards = dataset.leaderboards
+    tabs = {
+        "180s": lambda s: (band_table(dataset, s), boards.most_180s(s.data_type, 5)),
+        "checkouts": lambda s: (boards.top("checkouts", s, 5), boards.top("big_fish", Selection(s.data_type))),
+        "lowest_legs": lambda s: (boards.top("lowest_legs", s, 5), boards.top("fastest_legs", Selection(s.data_type), 5)),
+        "player_stats": lambda s: (player_stats_table(dataset, s), distribution_table(dataset, s),
+                                   form_table(dataset, s.data_type)),
+        "individual": lambda s: individual_tab(dataset, s),
+    }
+    stages = {}
+    for name, fn in tabs.items():
+        times = [timed(fn, s, repeat=repeat)[1] for s in selections]
+        stages[f"tab.{name}"] = float(np.mean(times))
+        stages[f"tab.{name}.max"] = float(np.max(times))
+    return stages
+
+
+def individual_tab(dataset, selection):
+    legs = selection.apply(dataset.legs)
+    if legs.empty:
+        return None
+    player = legs["Player"].iloc[0]
+    return player_trend(dataset, selection.data_type, player), h2h_table(dataset, player, selection.data_type)
+
+
+def run_scale(data_folder, workers, repeat):
+    """Time every stage on one data folder; returns the run record."""
+    stages = {}
+
+    legs, stages["ingest.serial"] = timed(lambda: IngestCache().load(data_folder, workers=1)[0])
+    if workers > 1:
+        _, stages["ingest.parallel"] = timed(lambda: IngestCache().load(data_folder, workers=workers))
+    cache = IngestCache()
+    cache.load(data_folder)
+    _, stages["ingest.unchanged"] = timed(cache.load, data_folder, repeat=repeat)
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        store = SnapshotStore(data_folder, snapshot_dir=snapshot_dir)
+        if store.enabled:
+            _, stages["snapshot.write"] = timed(store.write, legs, cache.manifest())
+            _, stages["snapshot.fresh_check"] = timed(store.is_fresh, repeat=repeat)
+            _, stages["snapshot.read"] = timed(store.read, repeat=repeat)
+
+        # Optional SQLite backend: a cold load, the no-change check and the pushed-down tab queries
+        sql_store = SqliteStore(data_folder, path=os.path.join(snapshot_dir, SQLITE_FILE))
+        _, stages["sql.sync"] = timed(sql_store.sync, cache)
+        _, stages["sql.unchanged"] = timed(sql_store.sync, cache, repeat=repeat)
+        sql_selections = sample_selections(legs)
+        for name, fn in (("180s", sql_band_table), ("player_stats", sql_player_stats_table)):
+            times = [timed(fn, sql_store, s, repeat=repeat)[1] for s in sql_selections]
+            stages[f"sql.tab.{name}"] = float(np.mean(times))
+            stages[f"sql.tab.{name}.max"] = float(np.max(times))
+
+    visits, stages["derived.visits"] = timed(build_visit_table, legs, repeat=repeat)
+    matches, stages["derived.matches"] = timed(build_match_table, legs, repeat=repeat)
+    _, stages["derived.cube"] = timed(build_player_cube, legs, matches, repeat=repeat)
+    _, stages["derived.histograms"] = timed(build_visit_histograms, legs, visits, repeat=repeat)
+    _, stages["derived.h2h"] = timed(build_h2h_index, legs, matches, repeat=repeat)
+    _, stages["derived.leaderboards"] = timed(build_leaderboards, legs, repeat=repeat)
+    _, stages["derived.trends"] = timed(build_trend_index, legs, repeat=repeat)
+    _, stages["derived.ratings"] = timed(lambda: RatingEngine().replay(matches), repeat=repeat)
+    dataset, stages["derived.total"] = timed(build_dataset, legs)
+
+    # Watch mode: fold the last file into a dataset built from the others
+    files = list_csv_files(data_folder)
+    if len(files) > 1:
+        head, _ = cache.load_files(data_folder, files[:-1])
+        tail, _ = cache.load_files(data_folder, files[-1:])
+        _, stages["derived.extend_one_file"] = timed(extend_dataset, build_dataset(head), tail)
+
+    selections = sample_selections(legs)
+    stages.update(time_tabs(dataset, selections, repeat))
+    # Every scope's report tables in one grouped pass (the bulk export, without the file writes)
+    _, stages["export.tables"] = timed(scope_tables, dataset, repeat=repeat)
+
+    # Match predictor: SIM_LEGS simulated legs between the two players with the most legs
+    scope = Selection("Competition")
+    top = legs.loc[scope.mask(legs), "Player"].astype(str).value_counts().index[:2]
+    if len(top) == 2:
+        models = [player_model(dataset, player, scope) for player in top]
+        _, stages["predict.serial"] = timed(predict_match, *models, legs=SIM_LEGS, seed=0, repeat=repeat)
+        if workers > 1:
+            _, stages["predict.parallel"] = timed(predict_match, *models, legs=SIM_LEGS, seed=0, workers=workers,
+                                                  repeat=repeat)
+
+    return {
+        "files": len(list_csv_files(data_folder)),
+        "legs": int(len(legs)),
+        "visits": int(len(dataset.visits)),
+        "matches": int(len(dataset.matches)),
+        "legs_memory_bytes": int(legs.memory_usage(deep=True).sum()),
+        "selections": len(selections),
+        "stages": stages,
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time ingest, derived tables and tab aggregations.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0],
+                        help="synthetic archive sizes to run (1 is about data/ today)")
+    parser.add_argument("--data", help="benchmark an existing data folder instead of synthetic archives")
+    parser.add_argument("--work-dir", help="keep generated archives here (reused when present)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3, help="best-of runs for the cheaper stages")
+    parser.add_argument("-o", "--output", help="report path (default: benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "repeat": args.repeat,
+        "runs": [],
+    }
+
+    if args.data:
+        targets = [(None, args.data)]
+        work_dir = None
+    else:
+        work_dir = args.work_dir or tempfile.mkdtemp(prefix="idl-bench-")
+        targets = [(scale, os.path.join(work_dir, f"scale-{scale:g}-seed-{args.seed}")) for scale in args.scales]
+
+    for scale, folder in targets:
+        record = {"scale": scale, "data": args.data}
+        if scale is not None and not list_csv_files(folder):
+            _, record["generate_seconds"] = timed(ArchiveGenerator(scale, args.seed).write, folder)
+        print(f"Benchmarking {folder} ...", file=sys.stderr)
+        record.update(run_scale(folder, args.workers, args.repeat))
+        report["runs"].append(record)
+        for stage, seconds in record["stages"].items():
+            print(f"  {stage:<28} {seconds * 1000:10.2f} ms", file=sys.stderr)
+
+    if work_dir and not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{commit or 'nocommit'}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
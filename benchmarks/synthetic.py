@@ -0,0 +1,272 @@
+import argparse
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from idl_stats.visits import START_SCORE
+
+# At scale 1 the generated archive is about the size of data/ today
+GP_EVENTS_PER_SCALE = 40
+LEAGUE_SEASONS_PER_SCALE = 1
+PLAYERS_PER_SCALE = 300
+
+GP_VENUES = ["Morden", "Hammersmith", "Footscray", "Wood Green", "Redhill", "Southwark"]
+LEAGUE_VENUES = ["Morden", "Southwark"]
+LEAGUE_DIVISIONS = ["Premier", "Division One", "Division Two"]
+KNOCKOUT_ROUNDS = ["Last 64", "Last 32", "Last 16", "Quarter-Final", "Semi-Final", "Final"]
+
+GROUP_SIZE = 5
+GROUP_LEGS_TO_WIN = 2
+KNOCKOUT_LEGS_TO_WIN = 3
+FINAL_LEGS_TO_WIN = 4
+LEAGUE_PLAYERS = 8
+LEAGUE_LEGS_TO_WIN = 8
+LEAGUE_MAX_LEGS = 14
+
+MAX_VISITS = 60
+# Scores that cannot be checked out in three darts
+BOGEY_NUMBERS = np.array([159, 162, 163, 165, 166, 168, 169])
+
+# The data files list the opponent columns in either order
+FIRST_THROWER_ORDER = ["Player", "First Thrower", "Opponent"]
+OPPONENT_ORDER = ["Player", "Opponent", "First Thrower"]
+
+
+def _play_legs(rng, skill):
+    """
+    One player's side of n legs: visit scores (n x MAX_VISITS, -1 after the
+    finish), the visit the leg was finished on (1-based) and the darts used
+    on that last visit.
+    """
+    n = len(skill)
+    raw = rng.normal(skill[:, None], 24, size=(n, MAX_VISITS))
+    p180 = np.clip((skill - 45) / 1800, 0.002, 0.04)
+    raw = np.where(rng.random((n, MAX_VISITS)) < p180[:, None], 180, raw)
+    raw = np.clip(np.rint(raw), 0, 180).astype(np.int16)
+
+    scores = np.full((n, MAX_VISITS), -1, dtype=np.int16)
+    remaining = np.full(n, START_SCORE, dtype=np.int16)
+    finish = np.full(n, MAX_VISITS, dtype=np.int16)
+    last_darts = np.full(n, 3, dtype=np.int8)
+    done = np.zeros(n, dtype=bool)
+
+    for v in range(MAX_VISITS):
+        active = ~done
+        if not active.any():
+            break
+        in_range = (remaining <= 170) & ~np.isin(remaining, BOGEY_NUMBERS)
+        checkout_p = np.clip(skill / 150 * (1.2 - remaining / 170), 0.05, 0.8)
+        hit = active & in_range & (rng.random(n) < checkout_p)
+
+        # Outside finishing range score freely (a bust scores nothing);
+        # inside it, a missed checkout leaves at least 2
+        setup = (rng.random(n) * (remaining - 1)).astype(np.int16)
+        free = np.where(raw[:, v] <= remaining - 2, raw[:, v], 0)
+        score = np.where(hit, remaining, np.where(remaining <= 170, setup, free)).astype(np.int16)
+
+        scores[active, v] = score[active]
+        remaining = np.where(active, remaining - score, remaining).astype(np.int16)
+        finish[hit] = v + 1
+        min_darts = np.where(remaining + score > 110, 3, np.where(remaining + score > 50, 2, 1))
+        last_darts[hit] = np.maximum(min_darts[hit], rng.integers(1, 4, size=n)[hit])
+        done |= hit
+
+    return scores, finish, last_darts
+
+
+def _leg_rows(rng, first, second, skill):
+    """
+    Simulate legs between two arrays of player ids (`first` throws first) and
+    return the per-leg winner plus the two rows (one per player) of each leg.
+    """
+    scores_a, finish_a, darts_a = _play_legs(rng, skill[first])
+    scores_b, finish_b, darts_b = _play_legs(rng, skill[second])
+
+    a_wins = finish_a <= finish_b
+    # The loser stops throwing once the winner has finished
+    visits_a = np.where(a_wins, finish_a, finish_b)
+    visits_b = np.where(a_wins, finish_a - 1, finish_b)
+    darts_total_a = np.where(a_wins, (finish_a - 1) * 3 + darts_a, visits_a * 3)
+    darts_total_b = np.where(a_wins, visits_b * 3, (finish_b - 1) * 3 + darts_b)
+
+    cols = np.arange(MAX_VISITS)
+    throws_a = np.where(cols < visits_a[:, None], scores_a, -1)
+    throws_b = np.where(cols < visits_b[:, None], scores_b, -1)
+    return a_wins, (throws_a, darts_total_a), (throws_b, darts_total_b)
+
+
+def play_matches(rng, home, away, skill, legs_to_win, max_legs=None):
+    """
+    Play matches between home[i] and away[i] (first to `legs_to_win`, or at
+    most `max_legs` legs). Returns (rows, home_won) where rows holds one entry
+    per player per leg.
+    """
+    home = np.asarray(home)
+    away = np.asarray(away)
+    n = len(home)
+    max_legs = max_legs or 2 * legs_to_win - 1
+
+    match = np.repeat(np.arange(n), max_legs)
+    leg = np.tile(np.arange(1, max_legs + 1), n)
+    home_first = leg % 2 == 1
+    first = np.where(home_first, home[match], away[match])
+    second = np.where(home_first, away[match], home[match])
+    first_wins, (throws_f, darts_f), (throws_s, darts_s) = _leg_rows(rng, first, second, skill)
+
+    # Legs after the match was decided are never played
+    home_won_leg = first_wins == home_first
+    wins_home = np.cumsum(home_won_leg.reshape(n, max_legs), axis=1)
+    wins_away = np.arange(1, max_legs + 1) - wins_home
+    decided_before = np.zeros((n, max_legs), dtype=bool)
+    decided_before[:, 1:] = (np.maximum(wins_home, wins_away) >= legs_to_win)[:, :-1]
+    played = ~decided_before.ravel()
+
+    home_legs = wins_home[:, -1] - np.where(decided_before, home_won_leg.reshape(n, max_legs), 0).sum(axis=1)
+    played_legs = (~decided_before).sum(axis=1)
+    home_won = home_legs * 2 > played_legs
+
+    idx = np.nonzero(played)[0]
+    rows = {
+        "match": np.concatenate([match[idx], match[idx]]),
+        "Player": np.concatenate([first[idx], second[idx]]),
+        "Opponent": np.concatenate([second[idx], first[idx]]),
+        "First Thrower": np.repeat(["First", "Second"], len(idx)),
+        "Leg": np.concatenate([leg[idx], leg[idx]]),
+        "Total Darts": np.concatenate([darts_f[idx], darts_s[idx]]),
+        "Result": np.concatenate([np.where(first_wins[idx], "WON", "LOST"), np.where(first_wins[idx], "LOST", "WON")]),
+        "throws": np.concatenate([throws_f[idx], throws_s[idx]]),
+    }
+    return rows, home_won
+
+
+def _round_robin(players):
+    pairs = [(a, b) for i, a in enumerate(players) for b in players[i + 1:]]
+    return [a for a, _ in pairs], [b for _, b in pairs]
+
+
+def _to_frame(rows, names, context, urls, column_order):
+    """Build a data/ style CSV frame from play_matches rows."""
+    order = np.lexsort((rows["First Thrower"] == "Second", rows["Leg"], rows["match"]))
+    throws = rows["throws"][order]
+    width = int((throws >= 0).sum(axis=1).max())
+    frame = pd.DataFrame({
+        **{col: np.asarray(values)[rows["match"][order]] if isinstance(values, np.ndarray) else values
+           for col, values in context.items()},
+        "URL": urls[rows["match"][order]],
+        "Player": names[rows["Player"][order]],
+        "Opponent": names[rows["Opponent"][order]],
+        "First Thrower": rows["First Thrower"][order],
+        "Leg": rows["Leg"][order],
+        "Total Darts": rows["Total Darts"][order],
+        "Result": rows["Result"][order],
+    })
+    frame = frame[["Venue", "Division", "Season", "Date", "Round", "URL"] + column_order + ["Leg", "Total Darts", "Result"]]
+    throw_frame = pd.DataFrame(throws[:, :width], columns=[f"Throw_{i}" for i in range(1, width + 1)])
+    throw_frame = throw_frame.astype("Int16").mask(throw_frame < 0)
+    return pd.concat([frame, throw_frame], axis=1)
+
+
+class ArchiveGenerator:
+    """
+    Writes a synthetic archive in the exact layout of data/: Grand Prix
+    events as <Venue>_<dd-mm-YYYY>_Groups.csv / _Knockouts.csv and league
+    seasons as <Season>_<Division>_<Venue>.csv, with a Throw_N width that
+    varies per file like the real exports.
+    """
+
+    def __init__(self, scale=1.0, seed=0):
+        self.scale = scale
+        self.rng = np.random.default_rng(seed)
+        n_players = max(40, int(PLAYERS_PER_SCALE * np.sqrt(scale)))
+        self.names = np.array([f"Player {i:05d}" for i in range(n_players)], dtype=object)
+        self.skill = np.clip(self.rng.normal(62, 11, n_players), 35, 100)
+        self._next_match = 0
+
+    def _urls(self, n):
+        start = self._next_match
+        self._next_match += n
+        return np.array([f"https://www.dartsatlas.com/matches/synth{i:09d}" for i in range(start, start + n)], dtype=object)
+
+    def grand_prix(self, venue, day):
+        """Frames (groups, knockouts) for one Grand Prix."""
+        rng = self.rng
+        field = rng.choice(len(self.names), size=int(rng.integers(16, 65)), replace=False)
+        date_str = day.strftime("%d/%m/%Y")
+        base = {"Venue": venue, "Division": None, "Season": None, "Date": date_str}
+
+        groups = [field[i:i + GROUP_SIZE] for i in range(0, len(field), GROUP_SIZE)]
+        home, away, group_round = [], [], []
+        for g, members in enumerate(groups, start=1):
+            h, a = _round_robin(list(members))
+            home += h
+            away += a
+            group_round += [f"Group {g}"] * len(h)
+        rows, home_won = play_matches(rng, home, away, self.skill, GROUP_LEGS_TO_WIN)
+        groups_frame = _to_frame(
+            rows, self.names, {**base, "Round": np.array(group_round, dtype=object)},
+            self._urls(len(home)), FIRST_THROWER_ORDER,
+        )
+
+        # Knockouts: the strongest group players, bracket trimmed to a power of two
+        wins = pd.Series(np.where(home_won, home, away)).value_counts()
+        size = 2 ** int(np.log2(max(2, min(len(field) // 2, 64))))
+        bracket = np.array(wins.index[:size].tolist() + [p for p in field if p not in set(wins.index)])[:size]
+        frames = []
+        while len(bracket) > 1:
+            round_name = KNOCKOUT_ROUNDS[-int(np.log2(len(bracket)))]
+            legs_to_win = FINAL_LEGS_TO_WIN if round_name == "Final" else KNOCKOUT_LEGS_TO_WIN
+            h, a = bracket[0::2], bracket[1::2]
+            rows, home_won = play_matches(rng, h, a, self.skill, legs_to_win)
+            frames.append(_to_frame(rows, self.names, {**base, "Round": round_name}, self._urls(len(h)), FIRST_THROWER_ORDER))
+            bracket = np.where(home_won, h, a)
+        knockouts_frame = pd.concat(frames, ignore_index=True)
+        return groups_frame, knockouts_frame
+
+    def league_division(self, venue, season, division, column_order):
+        """Frame for one league division season (round robin)."""
+        players = self.rng.choice(len(self.names), size=LEAGUE_PLAYERS, replace=False)
+        home, away = _round_robin(list(players))
+        rows, _ = play_matches(self.rng, home, away, self.skill, LEAGUE_LEGS_TO_WIN, max_legs=LEAGUE_MAX_LEGS)
+        context = {"Venue": venue, "Division": division, "Season": season, "Date": None, "Round": None}
+        return _to_frame(rows, self.names, context, self._urls(len(home)), column_order)
+
+    def write(self, out_dir):
+        """Write the whole archive to out_dir; returns the number of files written."""
+        os.makedirs(out_dir, exist_ok=True)
+        written = 0
+
+        first_day = date(2020, 1, 5)
+        for i in range(max(1, round(GP_EVENTS_PER_SCALE * self.scale))):
+            venue = GP_VENUES[i % len(GP_VENUES)]
+            day = first_day + timedelta(days=7 * i)
+            groups, knockouts = self.grand_prix(venue, day)
+            stem = f"{venue}_{day.strftime('%d-%m-%Y')}"
+            groups.to_csv(os.path.join(out_dir, f"{stem}_Groups.csv"), index=False)
+            knockouts.to_csv(os.path.join(out_dir, f"{stem}_Knockouts.csv"), index=False)
+            written += 2
+
+        for s in range(max(1, round(LEAGUE_SEASONS_PER_SCALE * self.scale))):
+            season = 30 + s
+            for v, venue in enumerate(LEAGUE_VENUES):
+                for d, division in enumerate(LEAGUE_DIVISIONS):
+                    order = OPPONENT_ORDER if (v + d) % 2 else FIRST_THROWER_ORDER
+                    frame = self.league_division(venue, season, division, order)
+                    frame.to_csv(os.path.join(out_dir, f"{season}_{division}_{venue}.csv"), index=False)
+                    written += 1
+        return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic IDL data folder.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--scale", type=float, default=1.0, help="1 is about the size of data/ today")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    files = ArchiveGenerator(args.scale, args.seed).write(args.out_dir)
+    print(f"Wrote {files} files to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
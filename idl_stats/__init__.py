@@ -0,0 +1,4 @@
+"""
+Stats engine behind the IDL Stats dashboard.
+Importable without streamlit; `python -m idl_stats --help` lists the command-line reports.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from idl_stats.cli import main
+
+sys.exit(main())
@@ -0,0 +1,143 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from idl_stats.trends import FORM_LEGS
+
+# Line traces with more points than this are drawn with WebGL (Scattergl)...
+WEBGL_POINTS = 1000
+# ...and thinned to about this many points first (each bucket keeps its low and high)
+MAX_POINTS = 2000
+
+MARGIN = dict(l=20, r=20, t=20, b=20)
+
+
+def downsample(y, max_points=MAX_POINTS):
+    """
+    Positions to keep of a series so at most ~max_points are drawn: the
+    first and last point plus the lowest and highest of each bucket, so
+    peaks and dips survive. All positions when the series is short enough.
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    # The points between the first and last, in equal buckets (the last one padded with NaN)
+    inner = np.asarray(y, dtype=float)[1:-1]
+    size = -(-len(inner) // (max_points // 2))
+    buckets = np.pad(inner, (0, -len(inner) % size), constant_values=np.nan).reshape(-1, size)
+    missing = np.isnan(buckets)
+    lows = np.where(missing, np.inf, buckets).argmin(axis=1)
+    highs = np.where(missing, -np.inf, buckets).argmax(axis=1)
+    # Buckets with no finite value keep nothing
+    kept = np.flatnonzero(np.isfinite(buckets).any(axis=1))
+    starts = 1 + size * kept
+    return np.unique(np.concatenate([[0, n - 1], starts + lows[kept], starts + highs[kept]]))
+
+
+def line_trace(x, y, customdata=None, **kwargs):
+    """A Scatter trace, switched to WebGL and downsampled for long series."""
+    if len(y) <= WEBGL_POINTS:
+        return go.Scatter(x=x, y=y, customdata=customdata, **kwargs)
+    keep = downsample(y)
+    return go.Scattergl(
+        x=np.asarray(x)[keep], y=np.asarray(y)[keep],
+        customdata=None if customdata is None else customdata[keep], **kwargs
+    )
+
+
+def most_180s_figure(chart_data, hover_columns):
+    """Horizontal bars of the biggest 180 hauls (chart_data in bottom-to-top order, with Unique_ID)."""
+    hover = "<br>".join(f"{col}: %{{customdata[{i}]}}" for i, col in enumerate(hover_columns[1:], start=1))
+    fig = go.Figure(go.Bar(
+        x=chart_data["180s"],
+        y=chart_data["Unique_ID"],
+        orientation='h',
+        text=chart_data["180s"],
+        textposition='outside',
+        hovertemplate='<b>%{customdata[0]}</b><br>' +
+                      '180s: %{x}<br>' +
+                      hover + '<extra></extra>',
+        customdata=chart_data[hover_columns].values,
+        marker=dict(color='#1f77b4')
+    ))
+    fig.update_yaxes(ticktext=chart_data["Player"], tickvals=chart_data["Unique_ID"])
+    fig.update_layout(
+        xaxis_title="", xaxis=dict(showticklabels=False, showgrid=False),
+        yaxis_title="", height=300, margin=MARGIN,
+        showlegend=False
+    )
+    return fig
+
+
+def trend_figure(trend_df, time_col, time_label):
+    """3-dart average per date / season."""
+    fig = go.Figure()
+    fig.add_trace(line_trace(
+        trend_df[time_col], trend_df["3DartAvg"],
+        name="3-Dart Avg", mode='lines+markers', line=dict(color='blue')
+    ))
+    fig.update_layout(xaxis_title=time_label, yaxis_title="3-Dart Avg", margin=MARGIN)
+    return fig
+
+
+def rolling_figure(rolling):
+    """Rolling FORM_LEGS-leg average after each leg."""
+    fig = go.Figure()
+    fig.add_trace(line_trace(
+        rolling.index + 1, rolling,
+        name=f"Last {FORM_LEGS} legs", mode='lines', line=dict(color='orange')
+    ))
+    fig.update_layout(xaxis_title="Legs played", yaxis_title=f"Rolling {FORM_LEGS}-leg Avg", margin=MARGIN)
+    return fig
+
+
+def rating_figure(rating_history):
+    """Rating after each rated match."""
+    fig = go.Figure()
+    fig.add_trace(line_trace(
+        rating_history.index + 1, rating_history["Rating"],
+        customdata=rating_history[["Opponent", "Change"]].values,
+        hovertemplate='Match %{x}<br>Rating: %{y:.0f}<br>vs %{customdata[0]} (%{customdata[1]:+.1f})<extra></extra>',
+        name="Rating", mode='lines', line=dict(color='purple')
+    ))
+    fig.update_layout(xaxis_title="Matches played", yaxis_title="Rating", margin=MARGIN)
+    return fig
+
+
+def visits_figure(visit_counts):
+    """Visit counts per score 0-180 (always 181 bars, so never downsampled)."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=visit_counts.index, y=visit_counts.to_numpy(),
+        hovertemplate='Score %{x}: %{y} visits<extra></extra>',
+        name="Visits", marker_color='teal'
+    ))
+    fig.update_layout(xaxis_title="Visit Score", yaxis_title="Visits", bargap=0, margin=MARGIN)
+    return fig
+
+
+def h2h_figure(rivals, player):
+    """Stacked matches won / lost / drawn per opponent."""
+    return px.bar(
+        rivals,
+        x="Opponent",
+        y=["MatchesWon", "MatchesLost", "MatchesDrawn"],
+        title=f"Head-to-Head: {player} (Matches)",
+        barmode='stack',
+        color_discrete_map={"MatchesWon": "green", "MatchesLost": "red", "MatchesDrawn": "gray"}
+    )
+
+
+def scoreline_figure(scorelines, players):
+    """Probability of each final score, the first player's wins first."""
+    a, b = players
+    labels = scorelines[a].astype(str) + "–" + scorelines[b].astype(str)
+    colors = ['green' if x > y else 'red' for x, y in zip(scorelines[a], scorelines[b])]
+    fig = go.Figure(go.Bar(
+        x=labels, y=scorelines["Probability"] * 100,
+        text=[f"{p:.1%}" for p in scorelines["Probability"]], textposition='outside',
+        hovertemplate=f'{a} %{{x}} {b}<br>%{{y:.1f}}%<extra></extra>',
+        marker_color=colors
+    ))
+    fig.update_layout(xaxis_title=f"{a} – {b}", yaxis_title="Probability (%)", margin=MARGIN)
+    return fig
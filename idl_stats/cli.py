@@ -0,0 +1,216 @@
+import argparse
+import json
+import sys
+
+from idl_stats import instrument
+from idl_stats.dedup import summarize_issues
+from idl_stats.export import EXPORT_FORMATS, write_reports
+from idl_stats.ingest import IngestCache
+from idl_stats.predict import BEST_OF, SIM_LEGS, player_model, predict_match
+from idl_stats.report import (
+    LEADERBOARDS, band_table, distribution_table, form_table, h2h_table, leaderboard_table, load_dataset,
+    make_selection, player_stats_table, ratings_table, sql_band_table, sql_player_stats_table,
+)
+from idl_stats.ratings import RatingEngine
+from idl_stats.sqlstore import SqliteStore
+from idl_stats.trends import FORM_LEGS, FORM_MATCHES
+
+
+def write_table(table, fmt, output):
+    """Write a table as CSV or JSON (a list of row objects) to a path, or stdout for "-"."""
+    if fmt == "json":
+        text = table.to_json(orient="records", date_format="iso", indent=2)
+    else:
+        text = table.to_csv(index=False)
+
+    if output == "-":
+        sys.stdout.write(text)
+        if not text.endswith("\n"):
+            sys.stdout.write("\n")
+    else:
+        with open(output, "w", newline="") as f:
+            f.write(text)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m idl_stats",
+        description="Compute IDL Stats tables from the CSV data folder without the dashboard.",
+    )
+    parser.add_argument("--data", default="data", help="data folder with the match CSVs (default: data)")
+    parser.add_argument("--workers", type=int, default=None, help="processes used to parse changed CSVs")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--timings", action="store_true", help="print stage timings as JSON to stderr")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory",
+                        help="sqlite answers stats and 180s from the indexed database under the data folder, "
+                             "without loading every leg (default: memory)")
+
+    selection = parser.add_argument_group("selection")
+    selection.add_argument("--type", dest="data_type", default="gp", help="league or gp (default: gp)")
+    selection.add_argument("--competition", help='Grand Prix label, e.g. "Morden - 05-Jan-2025" (default: all)')
+    selection.add_argument("--venue", help="league venue")
+    selection.add_argument("--season", help="league season")
+    selection.add_argument("--division", help="league division (default: all)")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="player stats table")
+    commands.add_parser("180s", help="180 / 140+ / 100+ counts per player")
+    commands.add_parser("distribution", help="visit score percentiles, spread and 26s per player")
+    form = commands.add_parser("form", help="players ranked by recent form")
+    form.add_argument("--legs", type=int, default=FORM_LEGS, help=f"legs in the form window (default: {FORM_LEGS})")
+    form.add_argument("--matches", type=int, default=FORM_MATCHES,
+                      help=f"matches in the form window (default: {FORM_MATCHES})")
+    board = commands.add_parser("leaderboard", help="a top-K leaderboard")
+    board.add_argument("name", choices=LEADERBOARDS)
+    board.add_argument("-k", type=int, default=None, help="rows to keep (default: the index K)")
+    h2h = commands.add_parser("h2h", help="a player's head-to-head record")
+    h2h.add_argument("player")
+    export = commands.add_parser(
+        "export", help="write the stats, 180s, checkouts and lowest-leg tables of every competition and season")
+    export.add_argument("output_dir", help="folder to write the reports into (one sub-folder per scope)")
+    export.add_argument("--formats", nargs="+", choices=EXPORT_FORMATS, default=["csv"])
+    export.add_argument("--html", action="store_true", help="also write a static HTML page per scope")
+    predict = commands.add_parser("predict", help="simulated win chances and final scores of a match, from both players' legs in the selection")
+    predict.add_argument("player")
+    predict.add_argument("opponent")
+    predict.add_argument("--best-of", type=int, choices=BEST_OF, default=5, help="legs in the match (default: 5)")
+    predict.add_argument("--legs", type=int, default=SIM_LEGS, help=f"legs to simulate (default: {SIM_LEGS})")
+    predict.add_argument("--seed", type=int, default=None, help="seed for a reproducible result")
+    commands.add_parser("check", help="duplicate, conflicting and unmirrored leg rows across the CSVs")
+    ratings = commands.add_parser("ratings", help="current player ratings")
+    ratings.add_argument("--verify", action="store_true",
+                         help="also replay the full history and fail if it differs from the saved ratings")
+    return parser
+
+
+# Commands the SQLite backend answers in the database; the others load the dataset as usual
+SQL_COMMANDS = {"stats": sql_player_stats_table, "180s": sql_band_table}
+
+
+def run_sql(args, selection):
+    """Run a command against the SQLite backend, after syncing it with the data folder."""
+    store, ingest = SqliteStore(args.data), IngestCache()
+    with instrument.stage("load"):
+        errors = store.sync(ingest, workers=args.workers)
+    for file, e in errors:
+        print(f"Error reading {file}: {e}", file=sys.stderr)
+    for line in summarize_issues(ingest.issues()):
+        print(line, file=sys.stderr)
+    if store.empty:
+        print(f"No CSV data found in {args.data}", file=sys.stderr)
+        return 1
+    with instrument.stage("compute"):
+        table = SQL_COMMANDS[args.command](store, selection)
+    with instrument.stage("write"):
+        write_table(table, args.format, args.output)
+    return 0
+
+
+def run_check(args, selection):
+    """Parse every CSV (bypassing the snapshot) and list the leg rows the leg index flags."""
+    ingest = IngestCache()
+    with instrument.stage("load"):
+        legs, errors = ingest.load(args.data, workers=args.workers)
+    for file, e in errors:
+        print(f"Error reading {file}: {e}", file=sys.stderr)
+    if legs.empty:
+        print(f"No CSV data found in {args.data}", file=sys.stderr)
+        return 1
+    with instrument.stage("compute"):
+        table = ingest.issues()
+    with instrument.stage("write"):
+        write_table(table, args.format, args.output)
+    return 0
+
+
+def run_memory(args, selection):
+    """Run a command against the in-memory dataset (snapshot / ingest cache path of the app)."""
+    with instrument.stage("load"):
+        dataset, errors = load_dataset(args.data, workers=args.workers)
+    for file, e in errors:
+        print(f"Error reading {file}: {e}", file=sys.stderr)
+    if dataset.empty:
+        print(f"No CSV data found in {args.data}", file=sys.stderr)
+        return 1
+
+    if args.command == "export":
+        with instrument.stage("export"):
+            index = write_reports(dataset, args.output_dir, formats=args.formats, html_pages=args.html)
+        print(f"Wrote {len(index)} reports to {args.output_dir}", file=sys.stderr)
+        return 0
+
+    with instrument.stage("compute"):
+        if args.command == "stats":
+            table = player_stats_table(dataset, selection)
+        elif args.command == "180s":
+            table = band_table(dataset, selection)
+        elif args.command == "distribution":
+            table = distribution_table(dataset, selection)
+        elif args.command == "form":
+            table = form_table(dataset, selection.data_type, legs=args.legs, matches=args.matches)
+        elif args.command == "leaderboard":
+            table = leaderboard_table(dataset, args.name, selection, args.k)
+        elif args.command == "h2h":
+            table = h2h_table(dataset, args.player, selection.data_type)
+        elif args.command == "predict":
+            try:
+                models = [player_model(dataset, player, selection) for player in (args.player, args.opponent)]
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 1
+            prediction = predict_match(*models, best_of=args.best_of, legs=args.legs, seed=args.seed,
+                                       workers=args.workers)
+            print(f"{args.player} {prediction.win[0]:.1%} - {prediction.win[1]:.1%} {args.opponent} "
+                  f"over {prediction.matches} simulated matches", file=sys.stderr)
+            table = prediction.scorelines
+        else:
+            table = ratings_table(dataset, selection.data_type)
+            if args.verify:
+                difference = dataset.ratings.max_difference(RatingEngine().replay(dataset.matches))
+                print(f"Full replay max rating difference: {difference:.6g}", file=sys.stderr)
+                if difference > 1e-6:
+                    return 1
+
+    with instrument.stage("write"):
+        write_table(table, args.format, args.output)
+    return 0
+
+
+def uses_selection(args):
+    """Whether a command's table is filtered by the selection (the others only use its data type)."""
+    if args.command == "leaderboard":
+        return args.name != "most_180s"
+    return args.command in ("stats", "180s", "distribution")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        selection = make_selection(
+            args.data_type,
+            competition=args.competition,
+            venue=args.venue,
+            season=args.season,
+            division=args.division,
+            scoped=uses_selection(args),
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.command == "check":
+        run = run_check
+    elif args.backend == "sqlite" and args.command in SQL_COMMANDS:
+        run = run_sql
+    else:
+        run = run_memory
+    with instrument.recording(args.command) as timings:
+        status = run(args, selection)
+    if status:
+        return status
+
+    if args.timings:
+        print(json.dumps(timings.record(selection=selection.label)), file=sys.stderr)
+    return 0
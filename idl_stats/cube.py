@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from idl_stats.schema import concat_aligned
+from idl_stats.selection import competition_labels
+
+# One cell per player per competition (Grand Prix date or league venue/season/division)
+CUBE_KEYS = ["Player", "DataType", "Venue", "Season", "Division", "Date_str"]
+
+# Additive per-cell measures; every average or percentage is derived from these
+LEG_SUMS = ["Count180", "Count140", "Count100", "TotalScored", "Total Darts", "First9Sum", "First9Count"]
+
+
+def build_player_cube(legs, matches):
+    """
+    Pre-aggregate legs and matches into additive sums per cube cell.
+    Any sidebar selection is answered by summing the matching cells.
+    """
+    keys = [k for k in CUBE_KEYS if k in legs.columns]
+    won = legs["Result"].astype(str).str.upper() == "WON"
+    first9_avg = legs["First9Avg"]
+
+    leg_frame = legs[keys + LEG_SUMS].assign(
+        First9AvgSum=first9_avg.fillna(0.0).to_numpy(),
+        First9AvgCount=first9_avg.notna().to_numpy(),
+        LegsPlayed=1,
+        LegsWon=won.to_numpy(),
+    )
+    cube = leg_frame.groupby(keys, observed=True, dropna=False, sort=False).sum()
+
+    match_frame = matches[keys].assign(
+        MatchesPlayed=1,
+        MatchesWon=(matches["MatchResult"] == "WON").to_numpy(),
+    )
+    match_sums = match_frame.groupby(keys, observed=True, dropna=False, sort=False).sum()
+
+    cube = cube.join(match_sums, how="left").fillna({"MatchesPlayed": 0, "MatchesWon": 0}).reset_index()
+    cube["Competition"] = competition_labels(cube)
+    return cube
+
+
+def merge_cubes(cube, new_cube):
+    """Fold the cube of newly added legs into an existing cube (cells are additive)."""
+    keys = [k for k in CUBE_KEYS if k in cube.columns]
+    cells = concat_aligned(cube, new_cube).drop(columns="Competition")
+    merged = cells.groupby(keys, observed=True, dropna=False, sort=False).sum().reset_index()
+    merged["Competition"] = competition_labels(merged)
+    return merged
+
+
+def sum_cells(cube, selection=None, by=("Player",)):
+    """Sum the cube cells inside a selection, grouped by the given keys."""
+    cells = cube if selection is None else selection.apply(cube)
+    measures = [c for c in cells.columns if c not in CUBE_KEYS and c != "Competition"]
+    return cells.groupby(list(by), observed=True, sort=False)[measures].sum().reset_index()
+
+
+def band_counts(cube, selection):
+    """Per-player 180 / 140+ / 100+ totals for the 180s table."""
+    sums = sum_cells(cube, selection)
+    return sums[["Player", "Count180", "Count140", "Count100"]]
+
+
+def player_stats(cube, selection):
+    """Per-player match/leg win rates and averages for the Player Stats table."""
+    return stats_from_sums(sum_cells(cube, selection))
+
+
+def stats_from_sums(sums, keys=("Player",)):
+    """
+    The Player Stats columns from per-player sums of the cube measures
+    (players with matches only), after the `keys` columns of the sums.
+    """
+    sums = sums[sums["MatchesPlayed"] > 0]
+
+    total_darts = sums["Total Darts"].astype(float)
+    first9_count = sums["First9AvgCount"].astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats = pd.DataFrame({
+            **{key: sums[key].to_numpy() for key in keys},
+            "MatchesPlayed": sums["MatchesPlayed"].astype(int).to_numpy(),
+            "MatchesWon": sums["MatchesWon"].astype(int).to_numpy(),
+            "MatchWin%": (sums["MatchesWon"] / sums["MatchesPlayed"] * 100).to_numpy(dtype=float),
+            "LegWin%": (sums["LegsWon"] / sums["LegsPlayed"] * 100).to_numpy(dtype=float),
+            "3DartAvg": np.where(total_darts > 0, sums["TotalScored"].astype(float) / total_darts * 3, 0.0),
+            "AvgFirst9": np.where(first9_count > 0, sums["First9AvgSum"] / first9_count, np.nan),
+        })
+    return stats
@@ -0,0 +1,110 @@
+from dataclasses import dataclass, replace
+
+import pandas as pd
+
+from idl_stats import instrument
+from idl_stats.cube import build_player_cube, merge_cubes
+from idl_stats.h2h import HeadToHeadIndex, build_h2h_index
+from idl_stats.histograms import VisitHistograms, build_visit_histograms
+from idl_stats.ingest import append_frames
+from idl_stats.leaderboards import Leaderboards, build_leaderboards
+from idl_stats.matches import build_match_table
+from idl_stats.ratings import RatingEngine
+from idl_stats.schema import concat_aligned
+from idl_stats.selection import build_filter_menu
+from idl_stats.trends import TrendIndex, build_trend_index
+from idl_stats.visits import build_visit_table
+
+
+@dataclass
+class Dataset:
+    """
+    The processed legs table plus the tables derived from it at load time.
+    ratings is filled in by the loader (it keeps state on disk), see update_ratings.
+
+    One Dataset is shared by every session of the server process, so it is
+    read-only once loaded: select with masks or index arrays (a Selection,
+    the menu, the cube) and derive new frames rather than writing to these.
+    """
+
+    legs: pd.DataFrame
+    visits: pd.DataFrame
+    matches: pd.DataFrame
+    cube: pd.DataFrame
+    histograms: VisitHistograms
+    h2h: HeadToHeadIndex
+    leaderboards: Leaderboards
+    trends: TrendIndex
+    menu: pd.DataFrame
+    ratings: RatingEngine = None
+
+    @property
+    def empty(self):
+        return self.legs.empty
+
+    def memory_usage(self):
+        """{table: bytes} for the frames held in memory."""
+        return instrument.frame_memory({
+            "legs": self.legs, "visits": self.visits, "matches": self.matches, "cube": self.cube,
+        })
+
+
+def build_dataset(legs):
+    """Derive every load-time table from the processed legs frame."""
+    if legs.empty:
+        return Dataset(legs=legs, visits=pd.DataFrame(), matches=pd.DataFrame(), cube=pd.DataFrame(), histograms=None,
+                       h2h=None, leaderboards=None, trends=None, menu=pd.DataFrame())
+    with instrument.stage("matches"):
+        matches = build_match_table(legs)
+    with instrument.stage("visits"):
+        visits = build_visit_table(legs)
+    with instrument.stage("cube"):
+        cube = build_player_cube(legs, matches)
+    with instrument.stage("histograms"):
+        histograms = build_visit_histograms(legs, visits)
+    with instrument.stage("h2h"):
+        h2h = build_h2h_index(legs, matches)
+    with instrument.stage("leaderboards"):
+        leaderboards = build_leaderboards(legs)
+    with instrument.stage("trends"):
+        trends = build_trend_index(legs)
+    with instrument.stage("menu"):
+        menu = build_filter_menu(legs)
+    return Dataset(legs=legs, visits=visits, matches=matches, cube=cube, histograms=histograms, h2h=h2h,
+                   leaderboards=leaderboards, trends=trends, menu=menu)
+
+
+def extend_dataset(dataset, new_legs):
+    """
+    Fold newly ingested legs (a combined frame of new files) into a Dataset,
+    deriving tables for the new rows only and merging them into the existing
+    ones. Returns the new Dataset, or None when the new legs continue matches
+    that are already loaded (those need a full build_dataset).
+    """
+    if dataset.empty:
+        return build_dataset(new_legs)
+    if new_legs["URL"].astype(str).isin(dataset.legs["URL"].astype(str)).any():
+        return None
+
+    with instrument.stage("append"):
+        legs = append_frames(dataset.legs, new_legs)
+        added = legs.iloc[len(dataset.legs):]
+    with instrument.stage("matches"):
+        new_matches = build_match_table(added)
+        matches = concat_aligned(dataset.matches, new_matches)
+    with instrument.stage("visits"):
+        visits = pd.concat([dataset.visits, build_visit_table(added)], ignore_index=True)
+    with instrument.stage("cube"):
+        cube = merge_cubes(dataset.cube, build_player_cube(added, new_matches))
+    with instrument.stage("histograms"):
+        histograms = dataset.histograms.merge(build_visit_histograms(added, visits.iloc[len(dataset.visits):]))
+    with instrument.stage("h2h"):
+        h2h = dataset.h2h.updated(legs, matches, new_matches)
+    with instrument.stage("leaderboards"):
+        leaderboards = dataset.leaderboards.update(added)
+    with instrument.stage("trends"):
+        trends = build_trend_index(legs)
+    with instrument.stage("menu"):
+        menu = build_filter_menu(legs)
+    return replace(dataset, legs=legs, visits=visits, matches=matches, cube=cube, histograms=histograms, h2h=h2h,
+                   leaderboards=leaderboards, trends=trends, menu=menu)
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+# A leg row is identified by the match page, the leg number and whose row it is
+LEG_KEY = ["URL", "Leg", "Player"]
+
+# Compared between two rows with the same key: equal -> a plain duplicate, else a conflict
+CONTENT_COLUMNS = ["Opponent", "Total Darts", "Result", "TotalScored", "LegCheckout", "First9Sum", "Count180"]
+
+ISSUE_COLUMNS = ["File", "URL", "Leg", "Player", "Issue", "OtherFile"]
+
+DUPLICATE = "duplicate"  # same key and stats as the row kept: dropped
+CONFLICT = "conflict"  # same key, different stats: dropped, the row of the first file by name is kept
+NO_MIRROR = "no mirror"  # the opponent has no row for this leg
+MIRROR_MISMATCH = "mirror mismatch"  # the opponent's row names someone else, or both rows won (or lost)
+
+
+def leg_keys(legs):
+    """The (URL, Leg, Player) key of each row, as tuples; None for rows missing part of it."""
+    columns = [legs[col] for col in LEG_KEY]
+    complete = np.logical_and.reduce([col.notna().to_numpy() for col in columns]).tolist()
+    return [k if ok else None for k, ok in zip(zip(*(col.tolist() for col in columns)), complete)]
+
+
+class LegIndex:
+    """
+    Hash index of the loaded leg rows on (URL, Leg, Player), kept by the
+    ingest cache across loads. Files are added one at a time, so checking a
+    new file only looks up its own rows. A key held by several rows is kept
+    in the first of them by (file name, row), whatever order the files came
+    in: a file that sorts earlier takes the key over, and when the holder
+    goes the next row in line gets it back. Every kept row's mirror, the
+    opponent's row for the same leg, is checked for a consistent player and result.
+    """
+
+    def __init__(self):
+        self._rows = {}  # key -> (file, opponent, result, row position in the file's frame) of the kept row
+        self._others = {}  # key -> [(file, position)] of the other rows with that key
+        self._frames = {}  # file -> its processed frame
+        self._dropped = {}  # file -> {position: key} of its rows held by another row
+        self._mirror_issues = {}  # key -> issue, for rows without a consistent mirror
+
+    def __contains__(self, file):
+        return file in self._frames
+
+    def _check_mirror(self, key):
+        row = self._rows.get(key)
+        issue = None
+        if row is not None:
+            url, leg, player = key
+            mirror = self._rows.get((url, leg, row[1]))
+            if mirror is None:
+                issue = NO_MIRROR
+            elif mirror[1] != player or {row[2], mirror[2]} != {"WON", "LOST"}:
+                issue = MIRROR_MISMATCH
+        if issue is None:
+            self._mirror_issues.pop(key, None)
+        else:
+            self._mirror_issues[key] = issue
+
+    def _row(self, file, position):
+        """(file, opponent, result, position) of a row of an indexed file, as add() records it."""
+        legs = self._frames[file]
+        result = legs["Result"].iloc[position]
+        return file, legs["Opponent"].iloc[position], result.upper() if isinstance(result, str) else result, position
+
+    def add(self, file, legs):
+        """Index a processed file frame; see keep() for the rows it keeps."""
+        self._frames[file] = legs
+        dropped = self._dropped[file] = {}
+        keys = leg_keys(legs)
+        rows = zip(keys, legs["Opponent"].tolist(), legs["Result"].str.upper().tolist())
+
+        checks = []  # keys whose row or mirror changed
+        for i, (key, opponent, result) in enumerate(rows):
+            if key is None:
+                continue  # cannot be matched up, kept as it is
+            previous = self._rows.get(key)
+            if previous is not None and (previous[0], previous[3]) < (file, i):
+                self._others.setdefault(key, []).append((file, i))
+                dropped[i] = key
+                continue
+            if previous is not None:
+                # This file sorts first: it takes the key over
+                self._others.setdefault(key, []).append((previous[0], previous[3]))
+                self._dropped[previous[0]][previous[3]] = key
+                checks.append((key[0], key[1], previous[1]))
+            self._rows[key] = (file, opponent, result, i)
+            checks += [key, (key[0], key[1], opponent)]
+        for key in dict.fromkeys(checks):
+            self._check_mirror(key)
+
+    def keep(self, file):
+        """The mask of the rows of an indexed file to keep, or None when it keeps all of them."""
+        dropped = self._dropped[file]
+        if not dropped:
+            return None
+        keep = np.ones(len(self._frames[file]), dtype=bool)
+        keep[list(dropped)] = False
+        return keep
+
+    def remove(self, file):
+        """Forget a file's rows; the keys it held go to the next row in line."""
+        if file not in self._frames:
+            return
+        checks = []
+        for key in leg_keys(self._frames[file]):
+            if key is None:
+                continue
+            others = self._others.get(key)
+            if others is not None:
+                others[:] = [other for other in others if other[0] != file]
+            held = self._rows.get(key)
+            if held is not None and held[0] == file:
+                del self._rows[key]
+                checks += [key, (key[0], key[1], held[1])]
+                if others:
+                    others.sort()
+                    row = self._rows[key] = self._row(*others.pop(0))
+                    del self._dropped[row[0]][row[3]]
+                    checks.append((key[0], key[1], row[1]))
+            if others == []:
+                del self._others[key]
+        del self._frames[file], self._dropped[file]
+        for key in dict.fromkeys(checks):
+            self._check_mirror(key)
+
+    def _same_content(self, dropped):
+        """Whether each dropped (file, position, key) row equals the row kept for its key."""
+        same = np.zeros(len(dropped), dtype=bool)
+        groups = {}
+        for n, (file, _, key) in enumerate(dropped):
+            groups.setdefault((file, self._rows[key][0]), []).append(n)
+        for (file, owner), group in groups.items():
+            new = self._frames[file][CONTENT_COLUMNS].take([dropped[n][1] for n in group]).reset_index(drop=True)
+            old = self._frames[owner][CONTENT_COLUMNS].take(
+                [self._rows[dropped[n][2]][3] for n in group]).reset_index(drop=True)
+            same[group] = ((new == old) | (new.isna() & old.isna())).all(axis=1).to_numpy()
+        return same
+
+    def issues(self):
+        """The dropped rows and the rows without a consistent mirror, one row per issue."""
+        dropped = [(file, i, key) for file, rows in self._dropped.items() for i, key in rows.items()]
+        same = self._same_content(dropped) if dropped else []
+        rows = [
+            (file, *key, DUPLICATE if is_same else CONFLICT, self._rows[key][0])
+            for (file, _, key), is_same in zip(dropped, same)
+        ]
+        rows += [(self._rows[key][0], *key, issue, None) for key, issue in self._mirror_issues.items()]
+        issues = pd.DataFrame(rows, columns=ISSUE_COLUMNS).astype({"Leg": "Int64"})
+        return issues.sort_values(["File", "URL", "Leg", "Player"], kind="stable").reset_index(drop=True)
+
+
+def summarize_issues(issues):
+    """One line per issue type, e.g. "3 duplicate leg rows dropped"."""
+    counts = issues["Issue"].value_counts()
+    labels = {
+        DUPLICATE: "duplicate leg rows dropped",
+        CONFLICT: "conflicting leg rows dropped (the first file by name is kept)",
+        NO_MIRROR: "leg rows without the opponent's row",
+        MIRROR_MISMATCH: "leg rows whose opponent row disagrees on the players or the result",
+    }
+    return [f"{counts[issue]} {label}" for issue, label in labels.items() if issue in counts]
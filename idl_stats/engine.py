@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+THROW_PREFIX = "Throw_"
+FIRST9_COLS = ["Throw_1", "Throw_2", "Throw_3"]
+
+
+def throw_columns(df):
+    """Return the Throw_N columns of a legs frame, ordered by visit number."""
+    cols = [col for col in df.columns if col.startswith(THROW_PREFIX)]
+    return sorted(cols, key=lambda c: int(c[len(THROW_PREFIX):]) if c[len(THROW_PREFIX):].isdigit() else float("inf"))
+
+
+def throw_matrix(df, throw_cols=None):
+    """Return the visit scores as a float (legs x visits) matrix, NaN where no visit was thrown."""
+    if throw_cols is None:
+        throw_cols = throw_columns(df)
+    if not throw_cols:
+        return np.empty((len(df), 0), dtype=float)
+    return df[throw_cols].to_numpy(dtype=float, na_value=np.nan)
+
+
+def compute_leg_stats(throws, first9_width=3):
+    """
+    Derive the per-leg stats from a (legs x visits) matrix of visit scores
+    using whole-array operations only. Columns must be in visit order.
+    Returns a dict of column name -> 1D array, one entry per leg.
+    """
+    throws = np.asarray(throws, dtype=float)
+    n_legs, n_visits = throws.shape
+    valid = ~np.isnan(throws)
+
+    # Band counts (NaN compares False so missing visits drop out)
+    count180 = (throws == 180).sum(axis=1)
+    count140 = ((throws >= 140) & (throws < 180)).sum(axis=1)
+    count100 = ((throws >= 100) & (throws < 140)).sum(axis=1)
+
+    # Last positive visit (potential checkout), 0 if none
+    positive = throws > 0
+    has_positive = positive.any(axis=1)
+    last_idx = n_visits - 1 - np.argmax(positive[:, ::-1], axis=1) if n_visits else np.zeros(n_legs, dtype=int)
+    checkout = np.zeros(n_legs, dtype=float)
+    if n_visits:
+        rows = np.flatnonzero(has_positive)
+        checkout[rows] = throws[rows, last_idx[rows]]
+
+    total_scored = np.where(valid, throws, 0.0).sum(axis=1)
+
+    # First 9 darts = first 3 visits
+    f9 = throws[:, :first9_width]
+    f9_valid = valid[:, :first9_width]
+    first9_sum = np.where(f9_valid, f9, 0.0).sum(axis=1)
+    first9_count = f9_valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        first9_avg = np.where(first9_count > 0, first9_sum / first9_count, np.nan)
+
+    # Sample standard deviation of the visits (ddof=1, NaN below 2 visits)
+    n_valid = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total_scored / n_valid
+        sq_dev = np.where(valid, (throws - mean[:, None]) ** 2, 0.0).sum(axis=1)
+        visit_std = np.where(n_valid > 1, np.sqrt(sq_dev / (n_valid - 1)), np.nan)
+
+    return {
+        "Count180": count180.astype("int64"),
+        "Count140": count140.astype("int64"),
+        "Count100": count100.astype("int64"),
+        "LegCheckout": checkout,
+        "TotalScored": total_scored,
+        "First9Sum": first9_sum,
+        "First9Count": first9_count.astype("int64"),
+        "First9Avg": first9_avg,
+        "VisitStdDev": visit_std,
+    }
+
+
+def add_leg_stats(df, throw_cols=None):
+    """Attach the derived per-leg stat columns to a legs frame (in place) and return it."""
+    if throw_cols is None:
+        throw_cols = throw_columns(df)
+    # First 9 only counts the Throw_1..3 columns that actually exist
+    first9_width = len([c for c in FIRST9_COLS if c in throw_cols])
+    stats = compute_leg_stats(throw_matrix(df, throw_cols), first9_width=first9_width)
+    # One block assignment rather than a column insert per stat
+    df[list(stats)] = pd.DataFrame(stats, index=df.index)
+    return df
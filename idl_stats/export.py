@@ -0,0 +1,151 @@
+import html
+import os
+import re
+
+import pandas as pd
+
+from idl_stats import instrument
+from idl_stats.cube import CUBE_KEYS, stats_from_sums
+from idl_stats.leaderboards import SCOPE_SEP, scope_keys
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET = True
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    PARQUET = False
+
+EXPORT_FORMATS = ["csv", "parquet"]
+
+# Rows kept per scope for the leaderboard tables, as the tabs show them
+EXPORT_TOP = 5
+
+# Table name -> columns, in the order the tabs show them
+EXPORT_TABLES = {
+    "player_stats": ["Player", "MatchesPlayed", "MatchesWon", "MatchWin%", "LegWin%", "3DartAvg", "AvgFirst9", "Rating"],
+    "180s": ["Player", "180s", "140+", "100+"],
+    "checkouts": ["Player", "Checkout", "URL"],
+    "lowest_legs": ["Player", "Darts Thrown", "URL"],
+}
+
+ALL = "All"
+
+
+def scope_path(scope):
+    """
+    Relative folder of a scope's reports: <DataType>/All, Competition/<label>,
+    League/<venue>/<season>/All or League/<venue>/<season>/<division>.
+    """
+    parts = scope.split(SCOPE_SEP)
+    if len(parts) == 1 or (parts[0] == "League" and len(parts) == 3):
+        parts.append(ALL)
+    return os.path.join(*(re.sub(r"[^\w.-]+", "-", part).strip("-") or "-" for part in parts))
+
+
+def scope_sums(cube):
+    """
+    Per-player sums of the cube measures for every scope in one grouped pass:
+    each cube cell is counted once per scope it belongs to (its DataType,
+    its competition, its league season and its division).
+    """
+    cells = pd.concat([cube.loc[s.index].assign(Scope=s.to_numpy()) for s in scope_keys(cube)], ignore_index=True)
+    measures = [c for c in cube.columns if c not in CUBE_KEYS and c != "Competition"]
+    return cells.groupby(["Scope", "Player"], observed=True, sort=False)[measures].sum().reset_index()
+
+
+def scope_tables(dataset, k=EXPORT_TOP):
+    """
+    {table name: one frame for every scope, with a Scope column}: the Player
+    Stats, 180s, checkouts and lowest-leg tables of every Grand Prix, league
+    season and division, and each DataType as a whole.
+    """
+    with instrument.stage("sums"):
+        sums = scope_sums(dataset.cube)
+
+    with instrument.stage("player_stats"):
+        stats = stats_from_sums(sums, keys=("Scope", "Player"))
+        stats["Player"] = stats["Player"].astype(str)
+        if dataset.ratings is not None:
+            data_types = stats["Scope"].str.split(SCOPE_SEP, regex=False).str[0]
+            ratings = pd.concat([
+                dataset.ratings.table(data_type)[["Player", "Rating"]].assign(DataType=data_type)
+                for data_type in data_types.unique()
+            ], ignore_index=True)
+            stats = stats.assign(DataType=data_types).merge(ratings, on=["DataType", "Player"], how="left")
+        else:
+            stats["Rating"] = float("nan")
+        stats = stats.sort_values(["Scope", "3DartAvg"], ascending=[True, False], kind="stable")
+
+    with instrument.stage("bands"):
+        bands = sums[["Scope", "Player", "Count180", "Count140", "Count100"]].rename(columns={
+            "Count180": "180s",
+            "Count140": "140+",
+            "Count100": "100+",
+        })
+        bands = bands.astype({"Player": str, "180s": int, "140+": int, "100+": int}).sort_values(
+            ["Scope", "180s", "140+", "100+"], ascending=[True, False, False, False], kind="stable")
+
+    with instrument.stage("leaderboards"):
+        checkouts = dataset.leaderboards.scopes("checkouts", k).rename(columns={"LegCheckout": "Checkout"})
+        lowest = dataset.leaderboards.scopes("lowest_legs", k).rename(columns={"Total Darts": "Darts Thrown"})
+
+    tables = {"player_stats": stats, "180s": bands, "checkouts": checkouts, "lowest_legs": lowest}
+    return {name: tables[name][["Scope"] + columns].reset_index(drop=True) for name, columns in EXPORT_TABLES.items()}
+
+
+def _html_page(title, tables):
+    sections = "".join(
+        f"<h2>{html.escape(name)}</h2>\n{table.to_html(index=False, float_format=lambda x: f'{x:.2f}', na_rep='')}\n"
+        for name, table in tables.items()
+    )
+    return (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title></head>\n"
+            f"<body>\n<h1>{html.escape(title)}</h1>\n{sections}</body></html>\n")
+
+
+def write_reports(dataset, output_dir, formats=("csv",), html_pages=False, k=EXPORT_TOP):
+    """
+    Write every scope's tables under output_dir (one folder per scope, see
+    scope_path), plus index.csv listing the scopes. Returns the index frame.
+    """
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown export format {unknown[0]!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    if "parquet" in formats and not PARQUET:
+        raise ValueError("Parquet export needs pyarrow")
+
+    with instrument.stage("tables"):
+        tables = scope_tables(dataset, k)
+
+    with instrument.stage("write"):
+        by_scope = {name: dict(tuple(table.groupby("Scope", sort=False))) for name, table in tables.items()}
+        scopes = sorted(set().union(*by_scope.values()))
+        index = []
+        for scope in scopes:
+            path = scope_path(scope)
+            folder = os.path.join(output_dir, path)
+            os.makedirs(folder, exist_ok=True)
+            reports = {
+                name: rows.get(scope, pd.DataFrame(columns=["Scope"] + EXPORT_TABLES[name])).drop(columns="Scope")
+                for name, rows in by_scope.items()
+            }
+            for name, table in reports.items():
+                if "csv" in formats:
+                    table.to_csv(os.path.join(folder, f"{name}.csv"), index=False)
+                if "parquet" in formats:
+                    table.to_parquet(os.path.join(folder, f"{name}.parquet"), index=False)
+            if html_pages:
+                with open(os.path.join(folder, "index.html"), "w") as f:
+                    f.write(_html_page(scope.replace(SCOPE_SEP, " - "), reports))
+            index.append({"Scope": scope, "Path": path, **{name: len(table) for name, table in reports.items()}})
+
+        index = pd.DataFrame(index)
+        index.to_csv(os.path.join(output_dir, "index.csv"), index=False)
+        if html_pages:
+            links = "".join(
+                f'<li><a href="{html.escape(row.Path.replace(os.sep, "/"))}/index.html">'
+                f"{html.escape(row.Scope.replace(SCOPE_SEP, ' - '))}</a></li>\n"
+                for row in index.itertuples()
+            )
+            with open(os.path.join(output_dir, "index.html"), "w") as f:
+                f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>IDL Stats reports</title></head>\n"
+                        f"<body>\n<h1>IDL Stats reports</h1>\n<ul>\n{links}</ul>\n</body></html>\n")
+    return index
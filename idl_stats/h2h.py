@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+H2H_KEYS = ["DataType", "Player", "Opponent"]
+
+H2H_COLUMNS = [
+    "Opponent", "MatchesPlayed", "MatchesWon", "MatchesLost", "MatchesDrawn",
+    "LegsWon", "LegsLost", "PlayerAvg", "OpponentAvg",
+]
+
+
+def build_h2h_table(legs, matches):
+    """
+    Player x opponent record per DataType. Every pairing appears from both
+    sides, so (A, B) and (B, A) are mirror images of each other.
+    """
+    outcome = matches["MatchResult"]
+    records = (
+        matches[H2H_KEYS + ["LegsWon", "LegsLost"]]
+        .assign(
+            MatchesPlayed=1,
+            MatchesWon=(outcome == "WON").to_numpy(),
+            MatchesLost=(outcome == "LOST").to_numpy(),
+            MatchesDrawn=(outcome == "DRAW").to_numpy(),
+        )
+        .groupby(H2H_KEYS, observed=True)
+        .sum()
+    )
+
+    scoring = legs.groupby(H2H_KEYS, observed=True)[["TotalScored", "Total Darts"]].sum()
+    darts = scoring["Total Darts"].astype(float)
+    player_avg = pd.Series(
+        np.where(darts > 0, scoring["TotalScored"].astype(float) / darts.where(darts > 0) * 3, np.nan),
+        index=scoring.index,
+    )
+    records["PlayerAvg"] = player_avg.reindex(records.index).to_numpy()
+
+    # The opponent's average against this player is the mirrored row
+    mirrored = player_avg.copy()
+    mirrored.index = mirrored.index.set_names(["DataType", "Opponent", "Player"])
+    mirrored = mirrored.reorder_levels(H2H_KEYS)
+    records["OpponentAvg"] = mirrored.reindex(records.index).to_numpy()
+
+    return records.reset_index()
+
+
+class HeadToHeadIndex:
+    """
+    Head-to-head records indexed per (DataType, Player) once, so picking a
+    player or a pairing is a dictionary lookup rather than a scan.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        # Row positions only; a player's frame is cut out when it is asked for
+        self._by_player = {
+            (str(data_type), str(player)): rows
+            for (data_type, player), rows in table.groupby(["DataType", "Player"], observed=True).indices.items()
+        }
+        keys = zip(table["DataType"].astype(str), table["Player"].astype(str), table["Opponent"].astype(str))
+        self._pairs = {key: i for i, key in enumerate(keys)}
+
+    def updated(self, legs, matches, new_matches):
+        """
+        A new index with the records of every player in `new_matches` recomputed
+        from the full legs and match tables; everyone else's records are reused.
+        """
+        players = new_matches["DataType"].astype(str) + "|" + new_matches["Player"].astype(str)
+        affected = pd.unique(players)
+
+        def touches(frame):
+            data_type = frame["DataType"].astype(str) + "|"
+            return ((data_type + frame["Player"].astype(str)).isin(affected)
+                    | (data_type + frame["Opponent"].astype(str)).isin(affected)).to_numpy()
+
+        fresh = build_h2h_table(legs[touches(legs)], matches[touches(matches)])
+        own = (fresh["DataType"].astype(str) + "|" + fresh["Player"].astype(str)).isin(affected)
+        old = self.table["DataType"].astype(str) + "|" + self.table["Player"].astype(str)
+        return HeadToHeadIndex(pd.concat([self.table[~old.isin(affected)], fresh[own]], ignore_index=True))
+
+    def rivals(self, player, data_type):
+        """Every opponent of a player with their record (empty frame if none)."""
+        rows = self._by_player.get((data_type, str(player)))
+        if rows is None:
+            return pd.DataFrame(columns=H2H_COLUMNS)
+        return self.table.iloc[rows][H2H_COLUMNS].reset_index(drop=True)
+
+    def pair(self, player, opponent, data_type):
+        """Record of `player` against `opponent` as a Series, or None if they never met."""
+        i = self._pairs.get((data_type, str(player), str(opponent)))
+        return None if i is None else self.table.iloc[i][H2H_COLUMNS]
+
+
+def build_h2h_index(legs, matches):
+    return HeadToHeadIndex(build_h2h_table(legs, matches))
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+from idl_stats.cube import CUBE_KEYS
+from idl_stats.schema import concat_aligned
+from idl_stats.selection import competition_labels
+from idl_stats.visits import MAX_VISIT_SCORE
+
+# One bin per visit score 0-180
+SCORE_BINS = MAX_VISIT_SCORE + 1
+
+# Score bands of the 180s table, as [low, high) bins (matching engine.compute_leg_stats)
+BANDS = {"Count180": (180, 181), "Count140": (140, 180), "Count100": (100, 140)}
+
+PERCENTILES = {"P10": 0.10, "P25": 0.25, "Median": 0.50, "P75": 0.75, "P90": 0.90}
+
+
+class VisitHistograms:
+    """
+    Visit score counts (0-180) per player per competition, the same cells
+    as the player cube. Counts are additive, so the distribution of any
+    selection is the sum of its cells' rows; nothing is re-melted per query.
+    """
+
+    def __init__(self, cells, counts):
+        self.cells = cells  # one row per cell: CUBE_KEYS + Competition
+        self.counts = counts  # (cells x SCORE_BINS) int32
+
+    def by_player(self, selection=None):
+        """(players, counts): the summed histogram of every player inside the selection."""
+        mask = np.ones(len(self.cells), dtype=bool) if selection is None else selection.mask(self.cells)
+        codes, players = pd.factorize(self.cells["Player"].to_numpy()[mask])
+        counts = np.zeros((len(players), SCORE_BINS), dtype=np.int64)
+        np.add.at(counts, codes, self.counts[mask])
+        return pd.Index(players, name="Player"), counts
+
+    def merge(self, other):
+        """A new VisitHistograms with the cells of `other` (e.g. newly added legs) added in."""
+        keys = [k for k in CUBE_KEYS if k in self.cells.columns]
+        cells = concat_aligned(self.cells, other.cells)
+        codes = cells.groupby(keys, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+        counts = np.zeros((int(codes.max()) + 1 if len(codes) else 0, SCORE_BINS), dtype=np.int32)
+        np.add.at(counts, codes, np.concatenate([self.counts, other.counts]))
+        _, first = np.unique(codes, return_index=True)
+        return VisitHistograms(cells.iloc[first].reset_index(drop=True), counts)
+
+    def player(self, player, selection=None):
+        """One player's summed histogram (a Series indexed by score)."""
+        mask = (self.cells["Player"].astype(str) == str(player)).to_numpy(dtype=bool, copy=True)
+        if selection is not None:
+            mask &= selection.mask(self.cells)
+        return pd.Series(self.counts[mask].sum(axis=0, dtype=np.int64), name="Visits").rename_axis("Score")
+
+
+def build_visit_histograms(legs, visits):
+    """Bincount every visit into its leg's cube cell (one pass over the visit table)."""
+    keys = [k for k in CUBE_KEYS if k in legs.columns]
+    cell_codes = legs.groupby(keys, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    n_cells = int(cell_codes.max()) + 1 if len(cell_codes) else 0
+
+    # LegId -> cell lookup (LegIds are row numbers of the combined frame)
+    leg_ids = legs["LegId"].to_numpy()
+    cell_of_leg = np.full(int(leg_ids.max()) + 1 if len(leg_ids) else 0, -1, dtype=np.int64)
+    cell_of_leg[leg_ids] = cell_codes
+
+    scores = visits["Score"].to_numpy().astype(np.int64)
+    cells = cell_of_leg[visits["LegId"].to_numpy()]
+    keep = (scores >= 0) & (scores <= MAX_VISIT_SCORE) & (cells >= 0)
+    flat = np.bincount(cells[keep] * SCORE_BINS + scores[keep], minlength=n_cells * SCORE_BINS)
+
+    _, first = np.unique(cell_codes, return_index=True)
+    cell_frame = legs[keys].iloc[first].reset_index(drop=True)
+    cell_frame["Competition"] = competition_labels(cell_frame)
+    return VisitHistograms(cell_frame, flat.reshape(n_cells, SCORE_BINS).astype(np.int32))
+
+
+def band_totals(counts):
+    """Count180 / Count140 / Count100 from (rows x SCORE_BINS) histograms."""
+    return {name: counts[:, low:high].sum(axis=1) for name, (low, high) in BANDS.items()}
+
+
+def percentiles(counts, quantiles):
+    """
+    Percentile scores of each histogram row (inverted CDF: the lowest score
+    with at least q of the visits at or below it). NaN for rows without visits.
+    """
+    totals = counts.sum(axis=1)
+    cumulative = counts.cumsum(axis=1)
+    result = {}
+    for name, q in quantiles.items():
+        target = np.maximum(np.ceil(q * totals), 1)
+        scores = (cumulative < target[:, None]).sum(axis=1).astype(float)
+        result[name] = np.where(totals > 0, scores, np.nan)
+    return result
+
+
+def distribution_stats(players, counts):
+    """Per-player visit percentiles, spread and 26s from summed histograms."""
+    scores = np.arange(SCORE_BINS, dtype=float)
+    totals = counts.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = counts @ scores / totals
+        variance = (counts @ scores ** 2 - totals * mean ** 2) / (totals - 1)
+        quantiles = percentiles(counts, PERCENTILES)
+        stats = pd.DataFrame({
+            "Player": np.asarray(players),
+            "Visits": totals,
+            "MeanVisit": mean,
+            **quantiles,
+            "IQR": quantiles["P75"] - quantiles["P25"],
+            "VisitStd": np.where(totals > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan),
+            "Count26": counts[:, 26],
+            "26%": counts[:, 26] / totals * 100,
+        })
+    return stats[stats["Visits"] > 0].reset_index(drop=True)
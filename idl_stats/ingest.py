@@ -0,0 +1,459 @@
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from idl_stats import instrument
+from idl_stats.dedup import LegIndex
+from idl_stats.engine import FIRST9_COLS, compute_leg_stats, throw_columns
+from idl_stats.schema import (
+    CSV_COLUMNS, NUMERIC_CSV_COLUMNS, REQUIRED_COLUMNS, apply_schema, concat_aligned, conform,
+)
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    CSV_ENGINE = "c"
+
+# Day-first formats, then ISO (every column is read as text, so ISO dates are parsed here too)
+DATE_FORMATS = ["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d %m %Y", "%Y-%m-%d"]
+
+
+def detect_data_type(df):
+    """Determine if the CSV is a Competition or League file."""
+    has_division = "Division" in df.columns and df["Division"].notna().any()
+    has_date = "Date" in df.columns and df["Date"].notna().any()
+
+    if has_division and not has_date:
+        return "League"
+    else:
+        return "Competition"
+
+
+def list_csv_files(data_folder):
+    """Return the CSV file names in the data folder, sorted so concat order is deterministic."""
+    if not os.path.exists(data_folder):
+        return []
+    return sorted(f for f in os.listdir(data_folder) if f.endswith(".csv"))
+
+
+def file_fingerprint(path):
+    """Cheap change check for a file: (size, mtime in ns)."""
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def file_digest(path):
+    """Content hash of a file."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def folder_signature(data_folder):
+    """Fingerprint of every CSV in the folder; changes whenever a file is added, removed or modified."""
+    return tuple(
+        (file, *file_fingerprint(os.path.join(data_folder, file)))
+        for file in list_csv_files(data_folder)
+    )
+
+
+class SchemaError(ValueError):
+    """A CSV that cannot be read as legs: missing columns, non-numeric scores or unknown dates."""
+
+
+def detect_date_format(values):
+    """The first known format that parses every one of `values` (None if none does)."""
+    for fmt in DATE_FORMATS:
+        if pd.to_datetime(values, format=fmt, errors="coerce").notna().all():
+            return fmt
+    return None
+
+
+def date_columns(original):
+    """
+    Parse a Date column into (ParsedDate, Date_str), in one pass over the
+    rows: a file holds a handful of distinct dates, so the format is
+    detected and the parsing done on those, then mapped back.
+    Raises SchemaError for a date no known format reads.
+    """
+    codes, uniques = pd.factorize(original)
+    uniques = pd.Index(uniques)
+    if uniques.empty:
+        # League files: no dates at all
+        parsed = pd.Series(pd.NaT, index=original.index, dtype="datetime64[ns]")
+        return parsed, original.astype("str")
+
+    values = uniques.astype(str)
+    fmt = detect_date_format(values)
+    if fmt is not None:
+        parsed = pd.DatetimeIndex(pd.to_datetime(values, format=fmt))
+    else:
+        # Mixed formats: each distinct value takes the first format that reads it
+        parsed = pd.DatetimeIndex([pd.NaT] * len(values))
+        for fmt in DATE_FORMATS:
+            parsed = parsed.where(parsed.notna(), pd.to_datetime(values, format=fmt, errors="coerce"))
+        if parsed.isna().any():
+            raise SchemaError(f"Date: unrecognised date {values[parsed.isna()][0]!r}")
+
+    # A trailing missing value, which the -1 code of an empty date takes
+    parsed = parsed.as_unit("ns").append(pd.DatetimeIndex([pd.NaT], dtype="datetime64[ns]"))
+    labels = pd.Index(parsed.strftime("%d-%b-%Y"), dtype="str")
+    return (pd.Series(parsed.take(codes), index=original.index),
+            pd.Series(labels.take(codes), index=original.index, dtype="str"))
+
+
+def to_number(values, name):
+    """A column as float64 whole numbers (NaN where empty); text or fractions raise SchemaError."""
+    if pd.api.types.is_integer_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values.astype("float64")
+    numbers = values if pd.api.types.is_float_dtype(values) else pd.to_numeric(values, errors="coerce")
+    numbers = numbers.to_numpy(dtype="float64", na_value=np.nan)
+    empty = np.isnan(numbers)
+    bad = (empty & values.notna().to_numpy()) | (np.where(empty, 0.0, numbers) % 1 != 0)
+    if bad.any():
+        row = int(np.flatnonzero(bad)[0])
+        raise SchemaError(f"{name}: {values.iloc[row]!r} on line {row + 2} is not a whole number")
+    return pd.Series(numbers, index=values.index, name=values.name, copy=False)
+
+
+def throw_scores(df, throw_cols):
+    """The Throw_N columns as one float (legs x visits) matrix, checked to hold whole numbers only."""
+    block = df[throw_cols]
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in block.dtypes):
+        return np.column_stack([to_number(block[col], col).to_numpy() for col in throw_cols])
+    scores = block.to_numpy(dtype=float, na_value=np.nan)
+    fractional = np.nan_to_num(scores) % 1 != 0
+    if fractional.any():
+        row, col = np.argwhere(fractional)[0]
+        raise SchemaError(f"{throw_cols[col]}: {scores[row, col]!r} on line {row + 2} is not a whole number")
+    return scores
+
+
+def normalized_columns(df):
+    """
+    Align one raw CSV frame to the canonical per-file schema: reject files
+    missing a required column, add the optional ones empty and drop unknown
+    ones, order the columns CSV_COLUMNS + Throw_N, and type them (strings as
+    str, numbers as float64) so that every file concatenates without an
+    object fallback. The compact schema is applied once, after the concat.
+    Returns the columns as a dict of name -> array, the Throw_N names and
+    their float (legs x visits) score matrix.
+    """
+    throw_cols = throw_columns(df)
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if not throw_cols:
+        missing.append("Throw_1")
+    if missing:
+        raise SchemaError(f"missing column{'s' if len(missing) > 1 else ''} {', '.join(missing)}")
+
+    empty = pd.Series(pd.NA, index=df.index, dtype="str")
+    columns = {}
+    for col in CSV_COLUMNS:
+        values = df[col] if col in df.columns else empty
+        if col in NUMERIC_CSV_COLUMNS:
+            values = to_number(values, col)
+        elif values.dtype != "str":
+            values = values.astype("str")
+        columns[col] = values.array
+    scores = throw_scores(df, throw_cols)
+    columns.update({col: scores[:, i] for i, col in enumerate(throw_cols)})
+    return columns, throw_cols, scores
+
+
+def process_frame(df):
+    """
+    Turn one raw CSV frame into a processed legs frame: canonical columns
+    and types, parsed dates and the derived per-leg stats. The columns are
+    built as arrays and the frame constructed once, the stats straight from
+    the score matrix; a frame this small costs more to grow column by
+    column than to compute.
+    """
+    columns, throw_cols, scores = normalized_columns(df)
+    date = pd.Series(columns["Date"], index=df.index, copy=False)
+    columns["OriginalDate"] = columns["Date"]
+    columns["DataType"] = detect_data_type(df)
+
+    with instrument.stage("dates"):
+        parsed_dates, date_str = date_columns(date)
+        columns["ParsedDate"], columns["Date_str"] = parsed_dates.array, date_str.array
+
+    with instrument.stage("leg_stats"):
+        # First 9 only counts the Throw_1..3 columns that actually exist
+        first9_width = len([c for c in FIRST9_COLS if c in throw_cols])
+        columns.update(compute_leg_stats(scores, first9_width=first9_width))
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def read_csv_bytes(raw):
+    """Parse raw CSV bytes, using the multithreaded pyarrow reader when it is installed."""
+    try:
+        return pd.read_csv(io.BytesIO(raw), engine=CSV_ENGINE)
+    except Exception:
+        if CSV_ENGINE == "c":
+            raise
+        # Fall back to the C parser so error messages match the default reader
+        return pd.read_csv(io.BytesIO(raw))
+
+
+def process_raw(raw):
+    """Parse and process one file's bytes (the unit of work for the ingest worker pool)."""
+    with instrument.stage("read_csv"):
+        df = read_csv_bytes(raw)
+    return process_frame(df)
+
+
+def combine_frames(frames):
+    """
+    Concatenate processed per-file frames ({file name: frame}, in order) into
+    one legs frame in the compact schema, with the File each row came from.
+    """
+    if not frames:
+        return pd.DataFrame()
+    # Every file has the same columns except for how many Throw_N it records
+    widest = {col for frame in frames.values() for col in throw_columns(frame)}
+    throw_cols = throw_columns(pd.DataFrame(columns=list(widest)))
+    first = next(iter(frames.values()))
+    derived = [col for col in first.columns if col not in CSV_COLUMNS and col not in widest]
+    columns = CSV_COLUMNS + throw_cols + derived
+    # One reindex on the concatenated frame rather than one per file
+    full_df = conform(pd.concat(list(frames.values()), ignore_index=True), columns)
+    # Stable row id linking the legs to the visit table
+    full_df["LegId"] = np.arange(len(full_df), dtype=np.int32)
+    full_df["File"] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(frames)), [len(frame) for frame in frames.values()]), categories=list(frames)
+    )
+    # Cast once on the combined frame so every file shares one set of categories
+    return apply_schema(full_df)
+
+
+def append_frames(full_df, new_df):
+    """
+    Append a combined frame of newly ingested legs to the full legs frame:
+    LegIds carry on from the full frame, so the result stays in the compact schema
+    with the old rows (and their ids) untouched.
+    """
+    if full_df.empty:
+        return new_df
+    new_df = new_df.assign(LegId=new_df["LegId"].to_numpy() + int(full_df["LegId"].max()) + 1)
+    return apply_schema(concat_aligned(full_df, new_df))
+
+
+class IngestCache:
+    """
+    Per-file cache of processed legs frames.
+    Each CSV is keyed on its content hash, with (size, mtime) as a cheap
+    pre-check, so only new or changed files are parsed and processed on load.
+    Leg rows held by another file are dropped through a LegIndex that grows
+    with the files, so a new file is checked against its own rows only, and
+    the rows kept are those of a full load whatever order files arrive in.
+    """
+
+    def __init__(self):
+        self._entries = {}  # path -> {"fingerprint", "digest", "frame", "error", "indexed"}
+        self.index = LegIndex()
+
+    def _stale(self, path):
+        """
+        Return (fingerprint, digest, raw) if the file needs (re)processing, else None.
+        Files whose content is unchanged just get their fingerprint updated.
+        """
+        fingerprint = file_fingerprint(path)
+        entry = self._entries.get(path)
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            return None
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        if entry is not None and entry["digest"] == digest:
+            # Touched but unchanged content
+            entry["fingerprint"] = fingerprint
+            return None
+        return fingerprint, digest, raw
+
+    @staticmethod
+    def _process_parallel(stale, workers):
+        # fork where available: workers only need idl_stats, and spawn would
+        # re-import the caller's __main__ (e.g. the streamlit script runner)
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        results = {}
+        with ProcessPoolExecutor(max_workers=min(workers, len(stale)), mp_context=context) as pool:
+            futures = {path: pool.submit(process_raw, raw) for path, (_, _, raw) in stale.items()}
+            for path, future in futures.items():
+                try:
+                    results[path] = (future.result(), None)
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    results[path] = (None, e)
+        return results
+
+    def _process(self, stale, workers):
+        """Process the stale files, across a worker pool when there is more than one to do."""
+        results = {}
+        if workers and workers > 1 and len(stale) > 1:
+            try:
+                results = self._process_parallel(stale, workers)
+            except BrokenProcessPool:
+                # A worker died (or could not start); redo the batch in-process
+                results = {}
+        for path, (_, _, raw) in stale.items():
+            if path not in results:
+                try:
+                    results[path] = (process_raw(raw), None)
+                except Exception as e:
+                    results[path] = (None, e)
+
+        for path, (frame, error) in results.items():
+            fingerprint, digest, _ = stale[path]
+            self.index.remove(os.path.basename(path))
+            self._entries[path] = {"fingerprint": fingerprint, "digest": digest, "frame": frame, "error": error}
+
+    def load(self, data_folder, workers=None):
+        """
+        Return (full_df, errors) for the folder, re-processing only new or changed files.
+        errors is a list of (file name, exception) for files that could not be read.
+        With workers > 1 the changed files are parsed in parallel processes; the
+        result is merged in file-name order so it is identical to a serial load.
+        """
+        files = list_csv_files(data_folder)
+        paths = {os.path.join(data_folder, file) for file in files}
+
+        # Forget files that have been removed from the folder
+        removed = set(self._entries) - paths
+        for path in removed:
+            self.index.remove(os.path.basename(path))
+            del self._entries[path]
+        if removed:
+            self._drop_partial()
+        return self.load_files(data_folder, files, workers=workers)
+
+    def load_files(self, data_folder, files, workers=None):
+        """
+        Return (legs, errors) for some of the folder's files, in the given
+        order, re-processing only those that are new or changed.
+        """
+        frames, errors = self.frames(data_folder, files, workers=workers)
+        with instrument.stage("combine"):
+            return combine_frames(frames), errors
+
+    def frames(self, data_folder, files, workers=None):
+        """
+        Return ({file: processed frame}, errors) for some of the folder's
+        files, in the given order, re-processing only those that are new or changed.
+        Every file the cache holds is in the leg index, and each frame comes
+        without the rows held by a file that sorts before it (or an earlier
+        row of its own).
+        """
+        paths = [os.path.join(data_folder, file) for file in files]
+
+        stale = {}
+        with instrument.stage("fingerprint"):
+            for path in paths:
+                check = self._stale(path)
+                if check is not None:
+                    stale[path] = check
+            if any(path in self._entries for path in stale) and self._drop_partial():
+                # A changed file may hold rows that the seeded files had given up
+                stale.update({path: self._stale(path) for path in paths if path not in self._entries})
+        instrument.cache_event("ingest_file", hit=True, count=len(paths) - len(stale))
+        if stale:
+            instrument.cache_event("ingest_file", hit=False, count=len(stale))
+            with instrument.stage("process"):
+                self._process(stale, workers)
+
+        frames, errors = {}, []
+        with instrument.stage("dedup"):
+            # Index the new and changed files, and those only seeded so far, asked for or not:
+            # the files loaded before may lose rows to them
+            for path, entry in self._entries.items():
+                if entry["error"] is None and not entry.get("indexed"):
+                    self.index.remove(os.path.basename(path))  # its stored rows only (see seed)
+                    self.index.add(os.path.basename(path), entry["frame"])
+                    entry["indexed"] = True
+            for file, path in zip(files, paths):
+                entry = self._entries[path]
+                if entry["error"] is not None:
+                    errors.append((file, entry["error"]))
+                    continue
+                keep = self.index.keep(file)
+                frames[file] = entry["frame"] if keep is None else entry["frame"][keep].reset_index(drop=True)
+        return frames, errors
+
+    def _drop_partial(self):
+        """Forget the seeded files that are missing rows; True if there were any."""
+        partial = [path for path, entry in self._entries.items() if entry.get("partial")]
+        for path in partial:
+            self.index.remove(os.path.basename(path))
+            del self._entries[path]
+        return bool(partial)
+
+    def seed_frames(self, data_folder, legs, manifest, partial=()):
+        """
+        Take the files behind a legs frame loaded from elsewhere (the
+        snapshot) as processed: each gets its rows, split on File, and its
+        manifest entry ({file: [size, mtime_ns, sha1]}), so a later load only
+        parses the files added or changed since. They are indexed on that load.
+        The `partial` files lack the rows they had dropped as duplicates, so
+        they are parsed again as soon as another file changes or goes.
+        """
+        codes = legs["File"].cat.codes.to_numpy()
+        starts = np.flatnonzero(np.diff(codes, prepend=-1))
+        # Rows of one file are contiguous: (start, end) of each file's slice
+        bounds = {
+            legs["File"].cat.categories[codes[start]]: (start, end)
+            for start, end in zip(starts, [*starts[1:], len(legs)])
+        }
+        legs = legs.drop(columns=["LegId", "File"])
+        for file, (size, mtime_ns, digest) in manifest.items():
+            start, end = bounds.get(file, (0, 0))  # no rows left: all dropped, or an empty file
+            self._entries[os.path.join(data_folder, file)] = {
+                "fingerprint": (size, mtime_ns),
+                "digest": digest,
+                "frame": legs.iloc[start:end].reset_index(drop=True),
+                "error": None,
+                "partial": file in partial,
+            }
+
+    def seed(self, file, legs):
+        """
+        Index a file's legs loaded from elsewhere (rows already stored, like
+        the SQLite backend's), so files processed after are checked against
+        them. Files already indexed are left alone.
+        """
+        if file not in self.index:
+            self.index.add(file, legs)
+
+    def issues(self):
+        """The duplicate, conflicting and unmirrored leg rows found so far (see LegIndex.issues)."""
+        return self.index.issues()
+
+    def partial_files(self):
+        """The files loaded with leg rows dropped in favour of another file's."""
+        return [
+            os.path.basename(path)
+            for path, entry in sorted(self._entries.items())
+            if entry["error"] is None and (
+                entry.get("partial") or entry.get("indexed") and self.index.keep(os.path.basename(path)) is not None
+            )
+        ]
+
+    def manifest(self):
+        """{file name: [size, mtime_ns, sha1]} for every file currently loaded without error."""
+        return {
+            os.path.basename(path): [*entry["fingerprint"], entry["digest"]]
+            for path, entry in sorted(self._entries.items())
+            if entry["error"] is None
+        }
+
+
+def load_folder(data_folder, workers=None):
+    """Full (non-incremental) rebuild of the legs frame for a folder."""
+    return IngestCache().load(data_folder, workers=workers)
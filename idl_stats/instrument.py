@@ -0,0 +1,173 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger("idl_stats")
+
+# Timings of the run in progress (one per script run / CLI call); None when nothing is recording
+_current = contextvars.ContextVar("idl_stats_timings", default=None)
+
+# Cache hit/miss totals since the process started, shared by every session
+_cache_totals = Counter()
+_cache_lock = threading.Lock()
+
+
+class RunTimings:
+    """
+    Named stage timings and cache hits/misses for one run.
+    Nested stages are recorded under their full dotted path, repeated
+    stages are summed.
+    """
+
+    def __init__(self, name="rerun"):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.calls = Counter()
+        self.cache = Counter()
+        self.memory = {}
+        self._stack = []
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.calls[stage] += 1
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def record(self, **extra):
+        """JSON-ready summary of the run (milliseconds)."""
+        return {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "event": self.name,
+            "total_ms": round(self.total * 1000, 3),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+            "cache": dict(self.cache),
+            **({"memory_bytes": self.memory} if self.memory else {}),
+            **extra,
+        }
+
+
+@contextmanager
+def recording(name="rerun"):
+    """Collect the stages and cache events of everything run inside the block."""
+    timings = RunTimings(name)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def start_run(name="rerun"):
+    """
+    Start recording a new run in the current context and return it, for
+    callers (like a Streamlit script) that cannot wrap themselves in recording().
+    """
+    timings = RunTimings(name)
+    _current.set(timings)
+    return timings
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def stage(name):
+    """Time a named stage into the current run (a no-op when nothing is recording)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    path = ".".join([*timings._stack, name])
+    timings._stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._stack.pop()
+        timings.add(path, time.perf_counter() - start)
+
+
+def cache_event(cache, hit, count=1):
+    """Count `count` hits (or misses) of a named cache."""
+    if count <= 0:
+        return
+    key = f"{cache}.{'hit' if hit else 'miss'}"
+    with _cache_lock:
+        _cache_totals[key] += count
+    timings = _current.get()
+    if timings is not None:
+        timings.cache[key] += count
+
+
+@contextmanager
+def cache_call(cache):
+    """
+    Wrap a call to a memoised function whose body calls cache_miss(cache):
+    the call counts as a hit unless the body ran.
+    """
+    timings = _current.get()
+    before = timings.cache[f"{cache}.miss"] if timings is not None else None
+    yield
+    if timings is not None and timings.cache[f"{cache}.miss"] == before:
+        cache_event(cache, hit=True)
+
+
+def cache_miss(cache):
+    cache_event(cache, hit=False)
+
+
+def cache_totals():
+    """{cache: {"hit": n, "miss": n}} since the process started."""
+    with _cache_lock:
+        totals = dict(_cache_totals)
+    summary = {}
+    for key, count in totals.items():
+        cache, outcome = key.rsplit(".", 1)
+        summary.setdefault(cache, {"hit": 0, "miss": 0})[outcome] = count
+    return summary
+
+
+def frame_memory(frames):
+    """{name: bytes} of each DataFrame (deep, so string/categorical data is counted)."""
+    return {name: int(frame.memory_usage(deep=True).sum()) for name, frame in frames.items() if frame is not None}
+
+
+def record_memory(frames):
+    """Add the memory size of each named DataFrame to the current run."""
+    timings = _current.get()
+    if timings is not None:
+        timings.memory.update(frame_memory(frames))
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per line: the record's dict payload, or its message."""
+
+    def format(self, record):
+        payload = record.msg if isinstance(record.msg, dict) else {"message": record.getMessage()}
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(path):
+    """Append structured records to `path` (once per process; falsy path disables file logging)."""
+    if not path or any(getattr(h, "_idl_stats", False) for h in logger.handlers):
+        return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(JsonLineFormatter())
+    handler._idl_stats = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def emit(timings, **extra):
+    """Log a run's record as one structured line."""
+    logger.info(timings.record(**extra))
@@ -0,0 +1,166 @@
+import pandas as pd
+
+from idl_stats.selection import competition_labels
+
+DEFAULT_K = 50
+
+# Columns kept on every leaderboard row
+ROW_COLUMNS = [
+    "Player", "LegCheckout", "Total Darts", "URL", "DataType",
+    "Venue", "Division", "Season", "Date_str", "ParsedDate",
+]
+
+# board name -> (row filter, sort columns, ascending, one row per player, capped at K)
+BOARDS = {
+    # Highest checkouts
+    "checkouts": (lambda rows: rows["Won"] & (rows["LegCheckout"] > 0), ["LegCheckout"], [False], False, True),
+    # Each player's lowest leg, best players first
+    "lowest_legs": (lambda rows: rows["Won"], ["Total Darts", "LegCheckout"], [True, False], True, True),
+    # Lowest individual legs
+    "fastest_legs": (lambda rows: rows["Won"], ["Total Darts", "LegCheckout"], [True, False], False, True),
+    # The 170 club: every 170 checkout, newest first
+    "big_fish": (lambda rows: rows["Won"] & (rows["LegCheckout"] == 170), ["ParsedDate"], [False], False, False),
+}
+
+# Cells a 180 haul is counted over
+HAUL_KEYS = {
+    "League": ["Player", "Venue", "Division", "Season"],
+    "Competition": ["Player", "Venue", "Date_str"],
+}
+
+SCOPE_SEP = "|"
+
+
+def scope_keys(frame):
+    """
+    Every leaderboard scope each row belongs to, one Series of scope keys per
+    level: the whole DataType, and for Grand Prix the competition, for League
+    the season and the division.
+    """
+    data_type = frame["DataType"].astype(str)
+    venue = frame["Venue"].astype(str)
+    season = frame["Season"].astype(str)
+    division = frame["Division"].astype(str)
+    competition = competition_labels(frame)
+    is_league = data_type == "League"
+
+    sep = SCOPE_SEP
+    return [
+        data_type,
+        (data_type + sep + competition)[~is_league],
+        (data_type + sep + venue + sep + season)[is_league],
+        (data_type + sep + venue + sep + season + sep + division)[is_league],
+    ]
+
+
+def scope_for(selection):
+    """The leaderboard scope key that answers a sidebar Selection."""
+    parts = [selection.data_type]
+    if selection.data_type == "League":
+        if selection.venue is not None:
+            parts += [selection.venue, selection.season]
+            if selection.division is not None:
+                parts.append(selection.division)
+    elif selection.competition is not None:
+        parts.append(selection.competition)
+    return SCOPE_SEP.join(str(p) for p in parts)
+
+
+def _rank(rows, sort_cols, ascending, per_player, k):
+    """Order candidate rows within each Scope and keep the top k."""
+    rows = rows.sort_values(["Scope"] + sort_cols, ascending=[True] + ascending, kind="stable", na_position="last")
+    if per_player:
+        rows = rows.drop_duplicates(["Scope", "Player"], keep="first")
+    if k is not None:
+        rows = rows.groupby("Scope", sort=False).head(k)
+    return rows
+
+
+def _candidates(legs):
+    """Leaderboard-relevant columns of the legs, one row per (scope, leg)."""
+    rows = legs[ROW_COLUMNS].copy()
+    # Plain strings (as the sidebar shows them) so rows from different loads concat cleanly
+    for col in ["Player", "URL", "DataType", "Venue", "Division", "Season", "Date_str"]:
+        rows[col] = rows[col].astype(str)
+    rows["Won"] = (legs["Result"].astype(str).str.upper() == "WON").to_numpy()
+    return pd.concat([rows.loc[s.index].assign(Scope=s.to_numpy()) for s in scope_keys(legs)], ignore_index=True)
+
+
+class Leaderboards:
+    """
+    Top-K leaderboards (checkouts, lowest legs, 170s, 180 hauls) kept per
+    scope: each Grand Prix, each league season and division, and overall.
+    Built once at ingest; update() returns a copy with newly arrived legs
+    folded in, re-ranking only the scopes they touch. A Leaderboards is
+    never changed after it is built, since sessions may still be reading it.
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self._boards = {name: {} for name in BOARDS}  # board -> {scope: ranked rows}
+        self._hauls = {data_type: pd.DataFrame() for data_type in HAUL_KEYS}
+
+    def _copy(self):
+        """A new Leaderboards sharing the ranked frames (each board dict is its own)."""
+        copy = Leaderboards(self.k)
+        copy._boards = {name: dict(board) for name, board in self._boards.items()}
+        copy._hauls = dict(self._hauls)
+        return copy
+
+    def update(self, new_legs):
+        """
+        A new Leaderboards with newly ingested legs merged into every board
+        (only the new rows are scanned); this one is left as it was.
+        """
+        updated = self._copy()
+        if new_legs.empty:
+            return updated
+        candidates = _candidates(new_legs)
+
+        for name, (row_filter, sort_cols, ascending, per_player, capped) in BOARDS.items():
+            k = self.k if capped else None
+            board = updated._boards[name]
+            rows = candidates[row_filter(candidates)]
+            touched = rows["Scope"].unique()
+            previous = [board[scope] for scope in touched if scope in board]
+            if previous:
+                rows = pd.concat([*previous, rows], ignore_index=True)
+            ranked = _rank(rows, sort_cols, ascending, per_player, k)
+            for scope, scope_rows in ranked.groupby("Scope", sort=False):
+                board[scope] = scope_rows.drop(columns=["Scope", "Won"]).reset_index(drop=True).assign(Scope=scope)
+
+        for data_type, keys in HAUL_KEYS.items():
+            legs = new_legs[new_legs["DataType"] == data_type]
+            if legs.empty:
+                continue
+            cells = legs[keys].astype(str).assign(**{"180s": legs["Count180"].astype(int).to_numpy()})
+            hauls = pd.concat([updated._hauls[data_type], cells], ignore_index=True)
+            updated._hauls[data_type] = hauls.groupby(keys, sort=False, as_index=False)["180s"].sum()
+        return updated
+
+    def top(self, name, selection, k=None):
+        """The ranked rows of a board for a Selection (at most k, default the index K)."""
+        rows = self._boards[name].get(scope_for(selection))
+        if rows is None:
+            return pd.DataFrame(columns=ROW_COLUMNS)
+        rows = rows.drop(columns="Scope")
+        return rows.head(k) if k is not None else rows
+
+    def scopes(self, name, k=None):
+        """The ranked rows of a board for every scope at once (with their Scope), at most k per scope."""
+        board = self._boards[name]
+        if not board:
+            return pd.DataFrame(columns=ROW_COLUMNS + ["Scope"])
+        rows = pd.concat(board.values(), ignore_index=True)
+        return rows.groupby("Scope", sort=False).head(k).reset_index(drop=True) if k is not None else rows
+
+    def most_180s(self, data_type, k=None):
+        """Biggest 180 hauls in one Grand Prix (or one league season/division)."""
+        hauls = self._hauls[data_type]
+        if hauls.empty:
+            return hauls
+        return hauls.sort_values("180s", ascending=False, kind="stable").head(k or self.k)
+
+
+def build_leaderboards(legs, k=DEFAULT_K):
+    return Leaderboards(k).update(legs)
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+
+from idl_stats import instrument
+from idl_stats.dataset import build_dataset, extend_dataset
+from idl_stats.ingest import IngestCache, file_digest, file_fingerprint, folder_signature, list_csv_files
+from idl_stats.ratings import update_ratings
+from idl_stats.store import SnapshotStore, load_with_snapshot
+
+
+class LiveDataset:
+    """
+    A Dataset that follows its data folder while the server runs (watch mode),
+    shared by every session. refresh() looks for new, changed and removed
+    CSVs: files that only add matches are parsed on their own and folded into
+    the existing tables and indexes (extend_dataset); anything else, like an
+    edited or deleted file, rebuilds from the ingest cache.
+
+    `signature` is the folder signature of the data held and changes on
+    every update, so it doubles as the version sessions compare against.
+    """
+
+    def __init__(self, data_folder, workers=None, store=None):
+        self.data_folder = data_folder
+        self.workers = workers
+        self.store = store or SnapshotStore(data_folder)
+        self.ingest = IngestCache()
+        self.dataset = None
+        self.errors = []
+        self.signature = None
+        self.updated = None  # time.time() of the last load or update
+        self.last_change = None  # "load", "append" or "rebuild"
+        self._files = {}  # file name -> [size, mtime_ns, sha1] of the files the dataset was built from
+        self._lock = threading.Lock()
+
+    def _changes(self):
+        """(added, changed, removed) file names relative to the loaded files."""
+        files = list_csv_files(self.data_folder)
+        added = [file for file in files if file not in self._files]
+        removed = [file for file in self._files if file not in files]
+        changed = []
+        for file in files:
+            if file not in self._files:
+                continue
+            path = os.path.join(self.data_folder, file)
+            size, mtime_ns, digest = self._files[file]
+            fingerprint = file_fingerprint(path)
+            if fingerprint == (size, mtime_ns):
+                continue
+            if fingerprint[0] != size or file_digest(path) != digest:
+                changed.append(file)
+            else:
+                self._files[file] = [*fingerprint, digest]  # touched, same content
+        return added, changed, removed
+
+    def _remember_failed(self, errors):
+        """Record unreadable files too, so they are not retried until they change."""
+        for file, _ in errors:
+            path = os.path.join(self.data_folder, file)
+            self._files[file] = [*file_fingerprint(path), file_digest(path)]
+
+    def _load(self):
+        legs, self.errors = load_with_snapshot(self.data_folder, self.ingest, store=self.store, workers=self.workers)
+        with instrument.stage("derive"):
+            self.dataset = build_dataset(legs)
+        # Files behind the legs frame: parsed, or seeded from the snapshot
+        self._files = self.ingest.manifest()
+        self._remember_failed(self.errors)
+
+    def _append(self, added):
+        """Parse only the added files and fold them in; False if they cannot simply be appended."""
+        if self._files and min(added) < max(self._files):
+            # Its rows would go before loaded ones (and could take their legs over): rebuild
+            return False
+        new_legs, errors = self.ingest.load_files(self.data_folder, added, workers=self.workers)
+        if not new_legs.empty:
+            with instrument.stage("derive"):
+                dataset = extend_dataset(self.dataset, new_legs)
+            if dataset is None:
+                return False
+            self.dataset = dataset
+
+        self.errors = [error for error in self.errors if error[0] not in added] + errors
+        manifest = self.ingest.manifest()
+        self._files.update({file: manifest[file] for file in added if file in manifest})
+        self._remember_failed(errors)
+        if not new_legs.empty:
+            with instrument.stage("snapshot_write"):
+                self.store.write(self.dataset.legs, self._loaded_manifest(), self.ingest.partial_files())
+        return True
+
+    def _rebuild(self):
+        legs, self.errors = self.ingest.load(self.data_folder, workers=self.workers)
+        with instrument.stage("derive"):
+            self.dataset = build_dataset(legs)
+        self._files = self.ingest.manifest()
+        self._remember_failed(self.errors)
+        if not legs.empty:
+            with instrument.stage("snapshot_write"):
+                self.store.write(legs, self._loaded_manifest(), self.ingest.partial_files())
+
+    def _loaded_manifest(self):
+        """The snapshot manifest: every file in the legs frame (not the unreadable ones)."""
+        failed = {file for file, _ in self.errors}
+        return {file: entry for file, entry in sorted(self._files.items()) if file not in failed}
+
+    def snapshot(self):
+        """(dataset, signature, errors) of one load or update, read together under the lock."""
+        with self._lock:
+            return self.dataset, self.signature, self.errors
+
+    def refresh(self):
+        """
+        Bring the dataset up to date with the folder. Returns True if the data
+        changed (or was loaded for the first time). Cheap when nothing changed:
+        one stat per file.
+        """
+        with self._lock:
+            signature = folder_signature(self.data_folder)
+            if signature == self.signature:
+                return False
+
+            if self.dataset is None:
+                self._load()
+                change = "load"
+            else:
+                with instrument.stage("changes"):
+                    added, changed, removed = self._changes()
+                if not (added or changed or removed):
+                    self.signature = signature
+                    return False
+                change = "append"
+                if changed or removed or not self._append(added):
+                    self._rebuild()
+                    change = "rebuild"
+
+            if not self.dataset.empty:
+                # Ratings apply only the matches they have not seen
+                with instrument.stage("ratings"):
+                    self.dataset.ratings, mode = update_ratings(self.data_folder, self.dataset.matches)
+                instrument.cache_event("ratings", hit=mode != "replay")
+
+            self.signature = signature
+            self.updated = time.time()
+            self.last_change = change
+            return True
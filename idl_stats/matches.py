@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+MATCH_KEYS = ["URL", "Player", "Opponent"]
+# Competition-level columns carried onto every match row so the same filters apply
+CONTEXT_COLUMNS = ["DataType", "Venue", "Season", "Division", "Date_str", "ParsedDate", "Round"]
+
+
+def match_outcome(legs_won, legs_lost):
+    """WON / LOST / DRAW from legs won vs lost (vectorized)."""
+    return np.select([legs_won > legs_lost, legs_won < legs_lost], ["WON", "LOST"], "DRAW")
+
+
+def build_match_table(legs):
+    """
+    One row per (URL, Player, Opponent) with LegsWon, LegsLost, LegsPlayed,
+    MatchResult, the competition context (date/season, venue, division, round)
+    and FirstLegId, the LegId of its first leg (file order).
+    """
+    result = legs["Result"].astype(str).str.upper()
+    frame = legs[MATCH_KEYS + [c for c in CONTEXT_COLUMNS + ["LegId"] if c in legs.columns]].assign(
+        LegsWon=(result == "WON").to_numpy(),
+        LegsLost=(result == "LOST").to_numpy(),
+    )
+    grouped = frame.groupby(MATCH_KEYS, observed=True, sort=False)
+
+    agg = {c: "first" for c in CONTEXT_COLUMNS if c in frame.columns}
+    agg.update({"LegsWon": "sum", "LegsLost": "sum"})
+    if "LegId" in frame.columns:
+        agg["LegId"] = "min"
+    matches = grouped.agg(agg).rename(columns={"LegId": "FirstLegId"})
+    matches["LegsPlayed"] = grouped.size()
+    matches = matches.reset_index()
+
+    matches["MatchResult"] = pd.Categorical(
+        match_outcome(matches["LegsWon"].to_numpy(), matches["LegsLost"].to_numpy()),
+        categories=["WON", "LOST", "DRAW"],
+    )
+    return matches
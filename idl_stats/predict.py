@@ -0,0 +1,161 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from idl_stats.histograms import SCORE_BINS
+from idl_stats.visits import START_SCORE
+
+# Default simulation budget, in legs (best-of-N matches x N legs)
+SIM_LEGS = 100_000
+# Matches per chunk of work; chunks get their own seed, so results do not depend on the worker count
+CHUNK_MATCHES = 10_000
+# Most extra visits drawn to finish a lost leg (the rest count as this many)
+MAX_EXTRA_VISITS = 20
+
+BEST_OF = [1, 3, 5, 7, 9, 11]
+
+
+@dataclass
+class PlayerModel:
+    """
+    What the simulation knows about a player: the darts thrown and points
+    left in each of their legs (0 left for the legs they won) and the
+    probability of each visit score 0-180.
+    """
+
+    player: str
+    darts: np.ndarray
+    left: np.ndarray
+    visit_probs: np.ndarray
+
+    @property
+    def legs(self):
+        return len(self.darts)
+
+
+@dataclass
+class Prediction:
+    """Simulated outcome of a best-of-N match between two players."""
+
+    players: tuple
+    best_of: int
+    matches: int
+    win: tuple  # probability each player wins the match
+    expected_legs: tuple  # mean legs won by each player
+    leg_win: float  # probability the first player wins a leg (each player starting half of them)
+    expected_darts: tuple  # mean darts each player needs to finish a leg
+    scorelines: pd.DataFrame  # one row per final score with its probability
+
+
+def player_model(dataset, player, selection):
+    """A player's PlayerModel from their legs and visit scores inside a selection."""
+    legs = dataset.legs
+    mask = selection.mask(legs) & (legs["Player"].astype(str) == str(player)).to_numpy()
+    legs = legs[mask]
+    darts = legs["Total Darts"].to_numpy(dtype=float, na_value=np.nan)
+    scored = legs["TotalScored"].to_numpy(dtype=float, na_value=np.nan)
+    won = (legs["Result"].astype(str).str.upper() == "WON").to_numpy()
+    valid = (darts > 0) & ~np.isnan(scored)
+    left = np.where(won, 0.0, np.clip(START_SCORE - scored, 0, START_SCORE))
+
+    counts = dataset.histograms.player(player, selection).to_numpy(dtype=float)
+    if not valid.any() or counts.sum() == 0:
+        raise ValueError(f"No legs with visit scores for {player}")
+    return PlayerModel(str(player), darts[valid].astype(np.int32), left[valid].astype(np.int32),
+                       counts / counts.sum())
+
+
+def simulate_darts(model, n, rng):
+    """
+    Darts needed to finish n legs: each is one of the player's legs drawn at
+    random. A won leg counts as it was thrown; a lost leg gets extra visits,
+    drawn from the player's visit scores, until the points left are scored.
+    """
+    pick = rng.integers(model.legs, size=n)
+    darts = model.darts[pick].astype(np.int32)
+    left = model.left[pick]
+    unfinished = np.flatnonzero(left > 0)
+    if len(unfinished):
+        scores = rng.choice(SCORE_BINS, size=(len(unfinished), MAX_EXTRA_VISITS), p=model.visit_probs)
+        covered = scores.cumsum(axis=1, dtype=np.int32) >= left[unfinished, None]
+        extra = np.where(covered.any(axis=1), covered.argmax(axis=1) + 1, MAX_EXTRA_VISITS)
+        darts[unfinished] += 3 * extra.astype(np.int32)
+    return darts
+
+
+def simulate_chunk(model_a, model_b, best_of, matches, seed):
+    """
+    (legs won by A, legs won by B) in each of `matches` simulated matches,
+    plus the totals over every leg drawn (legs won by A, A's darts, B's
+    darts). All best_of legs are drawn for both players; the starter
+    alternates, A starting the first leg of half of the matches, and the
+    starter wins a leg if they need no more visits than the receiver.
+    """
+    rng = np.random.default_rng(seed)
+    darts_a = simulate_darts(model_a, matches * best_of, rng).reshape(matches, best_of)
+    darts_b = simulate_darts(model_b, matches * best_of, rng).reshape(matches, best_of)
+    visits_a, visits_b = -(-darts_a // 3), -(-darts_b // 3)
+
+    a_starts = (rng.integers(2, size=(matches, 1)) + np.arange(best_of)) % 2 == 0
+    a_wins = np.where(a_starts, visits_a <= visits_b, visits_a < visits_b)
+
+    # The match ends at the first leg where either player reaches the target
+    target = best_of // 2 + 1
+    won_a, won_b = a_wins.cumsum(axis=1), (~a_wins).cumsum(axis=1)
+    last = np.argmax(np.maximum(won_a, won_b) >= target, axis=1)
+    rows = np.arange(matches)
+    totals = (int(a_wins.sum()), int(darts_a.sum()), int(darts_b.sum()))
+    return won_a[rows, last], won_b[rows, last], totals
+
+
+def _run_chunks(model_a, model_b, best_of, chunks, seeds, workers):
+    if workers and workers > 1 and len(chunks) > 1:
+        # fork where available, as for the ingest pool
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+            return list(pool.map(simulate_chunk, [model_a] * len(chunks), [model_b] * len(chunks),
+                                 [best_of] * len(chunks), chunks, seeds))
+    return [simulate_chunk(model_a, model_b, best_of, n, seed) for n, seed in zip(chunks, seeds)]
+
+
+def predict_match(model_a, model_b, best_of=5, legs=SIM_LEGS, seed=None, workers=None):
+    """
+    Simulate about `legs` legs of best-of-`best_of` matches between two
+    players. With a seed the result is reproducible, whatever the number of
+    worker processes: the work is cut into fixed chunks with one seed each.
+    """
+    if best_of < 1 or best_of % 2 == 0:
+        raise ValueError("best_of must be an odd number of legs")
+    matches = max(legs // best_of, 1)
+    chunks = [CHUNK_MATCHES] * (matches // CHUNK_MATCHES)
+    if matches % CHUNK_MATCHES:
+        chunks.append(matches % CHUNK_MATCHES)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    results = _run_chunks(model_a, model_b, best_of, chunks, seeds, workers)
+    won_a = np.concatenate([r[0] for r in results])
+    won_b = np.concatenate([r[1] for r in results])
+    legs_won_a, darts_a, darts_b = np.sum([r[2] for r in results], axis=0)
+    drawn = matches * best_of
+
+    target = best_of // 2 + 1
+    scorelines = (
+        pd.DataFrame({model_a.player: won_a, model_b.player: won_b})
+        .value_counts(sort=False).rename("Probability").div(matches).reset_index()
+        .sort_values([model_a.player, model_b.player], ascending=[False, True], ignore_index=True)
+    )
+    p_a = float((won_a >= target).mean())
+    return Prediction(
+        players=(model_a.player, model_b.player),
+        best_of=best_of,
+        matches=matches,
+        win=(p_a, 1.0 - p_a),
+        expected_legs=(float(won_a.mean()), float(won_b.mean())),
+        leg_win=float(legs_won_a / drawn),
+        expected_darts=(float(darts_a / drawn), float(darts_b / drawn)),
+        scorelines=scorelines,
+    )
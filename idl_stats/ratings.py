@@ -0,0 +1,258 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    feather = None
+
+from idl_stats.store import SNAPSHOT_DIRNAME
+
+START_RATING = 1500.0
+K_FACTOR = 32.0
+
+# Bump whenever the rating formula or the stored state changes, so old state is replayed
+RATINGS_VERSION = 2
+STATE_FILE = "ratings.json"
+HISTORY_FILE = "ratings_history.feather"
+
+# Order of play inside one Grand Prix (groups first, final last)
+ROUND_ORDER = {
+    "Last 64": 1, "Last 32": 2, "Last 16": 3, "Quarter-Final": 4, "Semi-Final": 5, "Final": 6,
+}
+
+# Seq is the order the match was rated in
+HISTORY_COLUMNS = ["Seq", "DataType", "Player", "Opponent", "URL", "Time", "Season", "Date_str", "Rating", "Change"]
+
+
+def rating_matches(matches):
+    """
+    One row per match (the match table has both sides) in the order the
+    ratings are applied: by date (Grand Prix) or season (League), then round,
+    then file order. Time is a sortable integer: ns since epoch or the season.
+    Each match is seen from its alphabetically first player, flipped from the
+    other side when only that one was recorded.
+    """
+    player, opponent = matches["Player"].astype(str), matches["Opponent"].astype(str)
+    flip = (player > opponent).to_numpy()
+    sides = matches.assign(
+        Player=np.where(flip, opponent, player),
+        Opponent=np.where(flip, player, opponent),
+        LegsWon=np.where(flip, matches["LegsLost"], matches["LegsWon"]),
+        LegsLost=np.where(flip, matches["LegsWon"], matches["LegsLost"]),
+    )
+    # One row per match, the unflipped side when both were recorded
+    order = np.argsort(flip, kind="stable")
+    sides, valid = sides.iloc[order], (player != opponent).to_numpy()[order]
+    pairs = sides[valid & ~sides.duplicated(["URL", "Player", "Opponent"]).to_numpy()].sort_index()
+    is_league = (pairs["DataType"] == "League").to_numpy()
+
+    dates = pairs["ParsedDate"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    seasons = pairs["Season"].astype("float64").fillna(np.iinfo(np.int64).min).to_numpy().astype(np.int64)
+    rounds = pairs["Round"].astype(str).map(ROUND_ORDER).fillna(0).astype(int).to_numpy()
+
+    frame = pd.DataFrame({
+        "MatchKey": (pairs["URL"].astype(str) + "|" + pairs["Player"].astype(str) + "|" + pairs["Opponent"].astype(str)).to_numpy(),
+        "DataType": pairs["DataType"].astype(str).to_numpy(),
+        "URL": pairs["URL"].astype(str).to_numpy(),
+        "Player": pairs["Player"].astype(str).to_numpy(),
+        "Opponent": pairs["Opponent"].astype(str).to_numpy(),
+        "LegsWon": pairs["LegsWon"].to_numpy(dtype=np.int64),
+        "LegsLost": pairs["LegsLost"].to_numpy(dtype=np.int64),
+        "Time": np.where(is_league, seasons, dates),
+        "RoundRank": np.where(is_league, 0, rounds),
+        "FirstLegId": pairs["FirstLegId"].to_numpy(dtype=np.int64),
+        "Season": pairs["Season"].astype(str).to_numpy(),
+        "Date_str": pairs["Date_str"].astype(str).to_numpy(),
+    })
+    return frame.sort_values(["DataType", "Time", "RoundRank", "FirstLegId"], kind="stable").reset_index(drop=True)
+
+
+def expected_score(rating, opponent_rating):
+    return 1.0 / (1.0 + 10.0 ** ((opponent_rating - rating) / 400.0))
+
+
+class RatingEngine:
+    """
+    Elo ratings per DataType (league seasons carry no dates, so Grand Prix
+    and League are rated on their own timelines), scored on the share of
+    legs won so draws and margins count.
+
+    The state (ratings, processed matches and the rating history) can be
+    saved and reloaded; update() then applies only matches it has not seen.
+    Anything that a replay would not rate in the same order (back-filled,
+    edited or removed matches) triggers a full replay.
+    """
+
+    def __init__(self, k=K_FACTOR, start=START_RATING):
+        self.k = k
+        self.start = start
+        self.ratings = {}  # (data_type, player) -> rating
+        self.games = {}  # (data_type, player) -> rated matches
+        self.processed = {}  # match key -> [legs won, legs lost], in the order rated
+        self.history = []  # list of DataFrames in HISTORY_COLUMNS
+
+    def _apply(self, ordered):
+        """Apply matches in order (the rating recurrence is sequential)."""
+        if ordered.empty:
+            return
+        ratings, games, k, start = self.ratings, self.games, self.k, self.start
+        n = len(ordered)
+        rating_a, rating_b = np.empty(n), np.empty(n)
+        change = np.empty(n)
+
+        first_seq = len(self.processed)
+        columns = zip(ordered["DataType"], ordered["Player"], ordered["Opponent"], ordered["LegsWon"], ordered["LegsLost"])
+        for i, (data_type, player, opponent, won, lost) in enumerate(columns):
+            a, b = (data_type, player), (data_type, opponent)
+            ra, rb = ratings.get(a, start), ratings.get(b, start)
+            played = won + lost
+            score = won / played if played else 0.5
+            delta = k * (score - expected_score(ra, rb))
+            ratings[a] = rating_a[i] = ra + delta
+            ratings[b] = rating_b[i] = rb - delta
+            games[a] = games.get(a, 0) + 1
+            games[b] = games.get(b, 0) + 1
+            change[i] = delta
+
+        self.processed.update(zip(ordered["MatchKey"], map(list, zip(ordered["LegsWon"].tolist(), ordered["LegsLost"].tolist()))))
+
+        base = ordered[["DataType", "URL", "Time", "Season", "Date_str"]].assign(Seq=np.arange(first_seq, first_seq + n))
+        self.history.append(pd.concat([
+            base.assign(Player=ordered["Player"], Opponent=ordered["Opponent"], Rating=rating_a, Change=change),
+            base.assign(Player=ordered["Opponent"], Opponent=ordered["Player"], Rating=rating_b, Change=-change),
+        ], ignore_index=True)[HISTORY_COLUMNS])
+
+    @staticmethod
+    def _appendable(ordered, seen):
+        """
+        True if, within each DataType, every new match comes after every rated
+        one in the full ordering (ties on time and round included), so applying
+        the new ones alone matches a replay.
+        """
+        data_types = ordered["DataType"].to_numpy()
+        for data_type in np.unique(data_types):
+            rated = seen[data_types == data_type]
+            if not rated.all() and rated[np.argmin(rated):].any():
+                return False
+        return True
+
+    def update(self, matches):
+        """
+        Bring the ratings up to date with the match table.
+        Returns "unchanged", "incremental" (only new matches applied) or "replay".
+        """
+        ordered = rating_matches(matches)
+        keys = ordered["MatchKey"]
+        seen = keys.isin(self.processed.keys()).to_numpy()
+
+        # Removed or edited matches cannot be undone: rate everything again
+        if seen.sum() != len(self.processed) or any(
+            self.processed[key] != [won, lost]
+            for key, won, lost in zip(keys[seen], ordered["LegsWon"][seen].tolist(), ordered["LegsLost"][seen].tolist())
+        ):
+            self.replay(ordered)
+            return "replay"
+
+        new = ordered[~seen]
+        if new.empty:
+            return "unchanged"
+        if not self._appendable(ordered, seen):
+            self.replay(ordered)
+            return "replay"
+        self._apply(new)
+        return "incremental"
+
+    def replay(self, matches):
+        """Forget the state and rate the full history from scratch."""
+        ordered = matches if "MatchKey" in matches.columns else rating_matches(matches)
+        self.__init__(self.k, self.start)
+        self._apply(ordered)
+        return self
+
+    def table(self, data_type):
+        """Current Rating and RatedMatches per player of a DataType, best first."""
+        players = [(player, rating, self.games[(dt, player)]) for (dt, player), rating in self.ratings.items() if dt == data_type]
+        table = pd.DataFrame(players, columns=["Player", "Rating", "RatedMatches"])
+        return table.sort_values("Rating", ascending=False, kind="stable").reset_index(drop=True)
+
+    def rating(self, player, data_type):
+        return self.ratings.get((data_type, str(player)))
+
+    def player_history(self, player, data_type):
+        """A player's rating after each of their matches, in order."""
+        history = self.history_frame()
+        if history.empty:
+            return history
+        rows = history[(history["DataType"] == data_type) & (history["Player"] == str(player))]
+        return rows.sort_values("Seq").reset_index(drop=True)
+
+    def history_frame(self):
+        if len(self.history) > 1:
+            self.history = [pd.concat(self.history, ignore_index=True)]
+        return self.history[0] if self.history else pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    def max_difference(self, other):
+        """Largest absolute rating difference to another engine (0.0 if identical players)."""
+        if self.ratings.keys() != other.ratings.keys():
+            return float("inf")
+        return max((abs(r - other.ratings[key]) for key, r in self.ratings.items()), default=0.0)
+
+    def save(self, state_dir):
+        """Persist the state (JSON) and the rating history (Feather) with atomic renames."""
+        os.makedirs(state_dir, exist_ok=True)
+        state = {
+            "version": RATINGS_VERSION,
+            "k": self.k,
+            "start": self.start,
+            "ratings": [[dt, player, rating, self.games[(dt, player)]] for (dt, player), rating in self.ratings.items()],
+            "processed": self.processed,
+        }
+        pid = os.getpid()
+        if feather is not None:
+            history_path = os.path.join(state_dir, HISTORY_FILE)
+            feather.write_feather(self.history_frame(), f"{history_path}.{pid}.tmp", compression="uncompressed")
+            os.replace(f"{history_path}.{pid}.tmp", history_path)
+        state_path = os.path.join(state_dir, STATE_FILE)
+        with open(f"{state_path}.{pid}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{state_path}.{pid}.tmp", state_path)
+
+    @classmethod
+    def load(cls, state_dir, k=K_FACTOR, start=START_RATING):
+        """The saved engine, or a fresh one if there is no usable state for these settings."""
+        engine = cls(k, start)
+        try:
+            with open(os.path.join(state_dir, STATE_FILE)) as f:
+                state = json.load(f)
+            history = feather.read_feather(os.path.join(state_dir, HISTORY_FILE)) if feather is not None else None
+        except (OSError, ValueError):
+            return engine
+        if state.get("version") != RATINGS_VERSION or state["k"] != k or state["start"] != start or history is None:
+            return engine
+
+        for dt, player, rating, games in state["ratings"]:
+            engine.ratings[(dt, player)] = rating
+            engine.games[(dt, player)] = games
+        engine.processed = state["processed"]
+        engine.history = [history]
+        return engine
+
+
+def update_ratings(data_folder, matches, state_dir=None):
+    """
+    Load the saved ratings for a data folder, apply only what changed in
+    the match table and save them again. Returns (engine, mode).
+    """
+    state_dir = state_dir or os.path.join(data_folder, SNAPSHOT_DIRNAME)
+    engine = RatingEngine.load(state_dir)
+    mode = engine.update(matches)
+    if mode != "unchanged":
+        try:
+            engine.save(state_dir)
+        except OSError:
+            pass  # read-only deployments keep the in-memory ratings
+    return engine, mode
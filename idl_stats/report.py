@@ -0,0 +1,128 @@
+from idl_stats.cube import band_counts, player_stats
+from idl_stats.dataset import build_dataset
+from idl_stats.histograms import distribution_stats
+from idl_stats.ingest import IngestCache
+from idl_stats.leaderboards import BOARDS
+from idl_stats.ratings import update_ratings
+from idl_stats.selection import Selection
+from idl_stats.store import load_with_snapshot
+from idl_stats.trends import FORM_LEGS, FORM_MATCHES
+
+# Leaderboard names accepted by leaderboard_table (plus the 180 hauls)
+LEADERBOARDS = [*BOARDS, "most_180s"]
+
+
+def load_dataset(data_folder="data", workers=None):
+    """
+    Return (dataset, errors) for a data folder, going through the same
+    snapshot and ingest path as the app (ratings included).
+    """
+    legs, errors = load_with_snapshot(data_folder, IngestCache(), workers=workers)
+    dataset = build_dataset(legs)
+    if not dataset.empty:
+        dataset.ratings, _ = update_ratings(data_folder, dataset.matches)
+    return dataset, errors
+
+
+def make_selection(data_type, competition=None, venue=None, season=None, division=None, scoped=True):
+    """
+    Build a Selection from plain arguments. data_type accepts "League" or
+    "Competition" (aliases "league", "gp", "grand-prix").
+    A scoped League selection (one the tables are filtered by) needs a venue
+    and a season; reports that only use the data type pass scoped=False.
+    """
+    aliases = {"league": "League", "competition": "Competition", "gp": "Competition", "grand-prix": "Competition"}
+    data_type = aliases.get(str(data_type).lower(), data_type)
+    if scoped and data_type == "League" and (venue is None or season is None):
+        raise ValueError("A League selection needs a venue and a season")
+    return Selection(
+        data_type,
+        competition=competition,
+        venue=venue,
+        season=None if season is None else str(season),
+        division=division,
+    )
+
+
+def band_table(dataset, selection):
+    """Per-player 180 / 140+ / 100+ counts, as the 180s tab shows them."""
+    return format_band_table(band_counts(dataset.cube, selection))
+
+
+def sql_band_table(store, selection):
+    """band_table answered by the SQLite backend."""
+    return format_band_table(store.band_counts(selection))
+
+
+def format_band_table(counts):
+    table = counts.rename(columns={
+        "Count180": "180s",
+        "Count140": "140+",
+        "Count100": "100+",
+    })
+    return table.sort_values(by=["180s", "140+", "100+"], ascending=False).reset_index(drop=True)
+
+
+def distribution_table(dataset, selection):
+    """Per-player visit score percentiles, spread and 26s, highest median first."""
+    players, counts = dataset.histograms.by_player(selection)
+    table = distribution_stats(players, counts)
+    return table.sort_values(["Median", "MeanVisit"], ascending=False, kind="stable").reset_index(drop=True)
+
+
+def player_stats_table(dataset, selection):
+    """Per-player match/leg win rates and averages (plus Rating when rated), best 3-dart average first."""
+    stats = with_ratings(player_stats(dataset.cube, selection), dataset, selection.data_type)
+    return stats.sort_values("3DartAvg", ascending=False).reset_index(drop=True)
+
+
+def sql_player_stats_table(store, selection):
+    """player_stats_table answered by the SQLite backend (no ratings: they live with the in-memory matches)."""
+    return store.player_stats(selection).sort_values("3DartAvg", ascending=False).reset_index(drop=True)
+
+
+def with_ratings(table, dataset, data_type):
+    """Add each player's current Rating to a per-player table (unchanged if there are no ratings)."""
+    if dataset.ratings is None:
+        return table
+    ratings = dataset.ratings.table(data_type)[["Player", "Rating"]]
+    return table.merge(ratings, on="Player", how="left")
+
+
+def leaderboard_table(dataset, name, selection, k=None):
+    """
+    One leaderboard for a Selection: checkouts, lowest_legs, fastest_legs,
+    big_fish, or most_180s (which always covers the whole data type).
+    """
+    if name not in LEADERBOARDS:
+        raise ValueError(f"Unknown leaderboard {name!r}; expected one of {', '.join(LEADERBOARDS)}")
+    if name == "most_180s":
+        return dataset.leaderboards.most_180s(selection.data_type, k).reset_index(drop=True)
+    return dataset.leaderboards.top(name, selection, k).reset_index(drop=True)
+
+
+def player_trend(dataset, data_type, player):
+    """Per-date (Grand Prix) or per-season (League) 3-dart average of one player."""
+    return dataset.trends.trend(player, data_type)
+
+
+def form_table(dataset, data_type, legs=FORM_LEGS, matches=FORM_MATCHES, players=None, min_legs=None):
+    """
+    Every player's recent form (last `legs` legs, last `matches` matches and an
+    exponentially weighted average), best last-legs average first. Players with
+    fewer than `min_legs` legs (default: `legs`) are left out.
+    """
+    form = dataset.trends.form(data_type, legs=legs, matches=matches, players=players)
+    form = form[form["Legs"] >= (legs if min_legs is None else min_legs)]
+    return form.sort_values("LastLegsAvg", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def ratings_table(dataset, data_type):
+    """Current ratings of a DataType, best first."""
+    return dataset.ratings.table(data_type)
+
+
+def h2h_table(dataset, player, data_type):
+    """A player's record against every opponent, most matches won first."""
+    rivals = dataset.h2h.rivals(player, data_type)
+    return rivals.sort_values("MatchesWon", ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,90 @@
+import pandas as pd
+
+from idl_stats.engine import throw_columns
+
+# Columns of a leg CSV in canonical order (the Throw_N columns follow them)
+CSV_COLUMNS = [
+    "Venue", "Division", "Season", "Date", "Round", "URL", "Player",
+    "First Thrower", "Opponent", "Leg", "Total Darts", "Result",
+]
+
+# A file without these cannot be read as legs; the other CSV columns are added empty
+REQUIRED_COLUMNS = ["Venue", "URL", "Player", "Opponent", "Leg", "Total Darts", "Result"]
+
+# CSV columns read as numbers (float64 per file, so a missing value is NaN); the rest are strings
+NUMERIC_CSV_COLUMNS = ["Season", "Leg", "Total Darts"]
+
+# Low-cardinality strings: stored as categoricals (dictionary-encoded codes)
+CATEGORY_COLUMNS = [
+    "Venue", "Division", "Date", "Round", "URL", "Player", "Opponent",
+    "First Thrower", "Result", "OriginalDate", "DataType", "Date_str", "File",
+]
+
+# Small nullable integers for throws, darts and counts
+THROW_DTYPE = "Int16"
+# Throws read from the snapshot stay Arrow-backed (see SnapshotStore.read), with the same values
+ARROW_THROW_DTYPE = "int16[pyarrow]"
+INT_COLUMNS = {
+    "Season": "Int16",
+    "Leg": "Int16",
+    "Total Darts": "Int16",
+    "Count180": "Int8",
+    "Count140": "Int8",
+    "Count100": "Int8",
+    "First9Count": "Int8",
+    "LegCheckout": "Int16",
+    "TotalScored": "Int16",
+    "First9Sum": "Int16",
+}
+
+# First9Avg stays float64: it is averaged again per player and shown to 2dp
+FLOAT_COLUMNS = {
+    "VisitStdDev": "float32",
+}
+
+
+def apply_schema(df):
+    """
+    Return the legs frame cast to the compact schema.
+    Columns that are not present are skipped, so it works on single files
+    and on the concatenated frame alike.
+    """
+    casts = {}
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            casts[col] = "category"
+    for col in throw_columns(df):
+        if df[col].dtype not in (THROW_DTYPE, ARROW_THROW_DTYPE):
+            casts[col] = THROW_DTYPE
+    for col, dtype in {**INT_COLUMNS, **FLOAT_COLUMNS}.items():
+        if col in df.columns:
+            casts[col] = dtype
+    return df.astype(casts) if casts else df
+
+
+def conform(df, columns):
+    """
+    The frame with exactly `columns`, in that order. Files differ in how many
+    Throw_N columns they record; the missing ones are added empty (NaN, like
+    an unthrown visit), so every frame has the same columns and dtypes.
+    """
+    return df if list(df.columns) == columns else df.reindex(columns=columns)
+
+
+def concat_aligned(old_df, new_df):
+    """
+    Concatenate two frames so categorical columns keep one shared set of
+    categories (the old frame's codes are kept, new categories go last)
+    instead of falling back to object columns. New columns are cast to the
+    old frame's Arrow-backed throws, so those stay Arrow-backed.
+    """
+    old_df, new_df = old_df.copy(deep=False), new_df.copy(deep=False)
+    for col in old_df.columns.intersection(new_df.columns):
+        old_dtype, new_dtype = old_df[col].dtype, new_df[col].dtype
+        if isinstance(old_dtype, pd.CategoricalDtype) and isinstance(new_dtype, pd.CategoricalDtype):
+            categories = old_dtype.categories.append(new_dtype.categories.difference(old_dtype.categories))
+            old_df[col] = old_df[col].cat.set_categories(categories)
+            new_df[col] = new_df[col].cat.set_categories(categories)
+        elif old_dtype == ARROW_THROW_DTYPE and new_dtype != old_dtype:
+            new_df[col] = new_df[col].astype(old_dtype)
+    return pd.concat([old_df, new_df], ignore_index=True)
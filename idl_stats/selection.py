@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+
+ALL_COMPETITIONS = "All Competitions"
+ALL_DIVISIONS = "All Divisions"
+
+
+def competition_labels(df):
+    """Grand Prix label for every row: "<Venue> - <Date_str>"."""
+    return df["Venue"].astype(str) + " - " + df["Date_str"].astype(str)
+
+
+@dataclass(frozen=True)
+class Selection:
+    """
+    A sidebar filter choice. Works on any table that carries the
+    DataType / Venue / Season / Division / Date_str columns (legs, matches, ...).
+    None means "all" for competition and division.
+    """
+
+    data_type: str
+    competition: str = None
+    venue: str = None
+    season: str = None
+    division: str = None
+
+    @property
+    def label(self):
+        if self.data_type == "League":
+            if self.venue is None:
+                return "All League"
+            return f"{self.venue} - S{self.season} - {self.division or ALL_DIVISIONS}"
+        return self.competition or ALL_COMPETITIONS
+
+    def mask(self, df):
+        """Boolean row mask for the selection (League values compare as strings, like the sidebar)."""
+        mask = (df["DataType"] == self.data_type).to_numpy(dtype=bool, copy=True)
+        if self.competition is not None:
+            labels = df["Competition"] if "Competition" in df.columns else competition_labels(df)
+            mask &= (labels.astype(str) == self.competition).to_numpy()
+        for col, value in (("Venue", self.venue), ("Season", self.season), ("Division", self.division)):
+            if value is not None:
+                mask &= (df[col].astype(str) == value).to_numpy()
+        return mask
+
+    def apply(self, df):
+        return df[self.mask(df)]
+
+
+# Columns the sidebar filters on
+MENU_COLUMNS = ["DataType", "Venue", "Season", "Division", "Date_str", "ParsedDate"]
+
+
+def build_filter_menu(legs):
+    """
+    The distinct sidebar choices of the legs, in order of first appearance:
+    one row per DataType / Venue / Season / Division / Date_str, with the
+    values as the sidebar shows them (strings) and the Competition label.
+    A few hundred rows, so the sidebar filters this rather than the legs.
+    """
+    menu = legs[MENU_COLUMNS].drop_duplicates().reset_index(drop=True)
+    menu = menu.assign(**{col: menu[col].astype(str) for col in ("Venue", "Season", "Division")})
+    menu["Competition"] = competition_labels(menu)
+    return menu
@@ -0,0 +1,296 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from idl_stats import instrument
+from idl_stats.cube import stats_from_sums
+from idl_stats.dedup import CONTENT_COLUMNS, LEG_KEY
+from idl_stats.ingest import IngestCache, combine_frames, file_digest, file_fingerprint, list_csv_files
+from idl_stats.matches import build_match_table
+from idl_stats.selection import competition_labels
+from idl_stats.store import SNAPSHOT_DIRNAME
+
+SQLITE_FILE = "legs.sqlite"
+
+# Bump whenever the tables change shape, so an old database is rebuilt from the CSVs
+SQLITE_VERSION = 2
+
+# Per-leg columns kept in the database (no Throw_N: every tab query runs on the derived stats)
+LEG_COLUMNS = {
+    "LegId": "INTEGER PRIMARY KEY",
+    "File": "TEXT NOT NULL",
+    "DataType": "TEXT",
+    "Venue": "TEXT",
+    "Season": "INTEGER",
+    "Division": "TEXT",
+    "Date_str": "TEXT",
+    "ParsedDate": "TIMESTAMP",
+    "Competition": "TEXT",
+    "Round": "TEXT",
+    "URL": "TEXT",
+    "Player": "TEXT",
+    "Opponent": "TEXT",
+    "Leg": "INTEGER",
+    "Total Darts": "INTEGER",
+    "Result": "TEXT",
+    "Count180": "INTEGER",
+    "Count140": "INTEGER",
+    "Count100": "INTEGER",
+    "LegCheckout": "INTEGER",
+    "TotalScored": "INTEGER",
+    "First9Sum": "INTEGER",
+    "First9Count": "INTEGER",
+    "First9Avg": "REAL",
+    "VisitStdDev": "REAL",
+}
+
+MATCH_COLUMNS = {
+    "File": "TEXT NOT NULL",
+    "URL": "TEXT",
+    "Player": "TEXT",
+    "Opponent": "TEXT",
+    "DataType": "TEXT",
+    "Venue": "TEXT",
+    "Season": "INTEGER",
+    "Division": "TEXT",
+    "Date_str": "TEXT",
+    "Competition": "TEXT",
+    "LegsWon": "INTEGER",
+    "LegsLost": "INTEGER",
+    "LegsPlayed": "INTEGER",
+    "MatchResult": "TEXT",
+    "FirstLegId": "INTEGER",
+}
+
+FILE_COLUMNS = {
+    "File": "TEXT PRIMARY KEY",
+    "Size": "INTEGER",
+    "MtimeNs": "INTEGER",
+    "Sha1": "TEXT",
+    "Error": "TEXT",  # why the file could not be read, NULL if it was
+    "Dropped": "INTEGER",  # rows not stored because another file holds the same leg
+}
+
+# Every sidebar filter is a prefix of one of these
+INDEXES = {
+    "legs_league": "legs (DataType, Venue, Season, Division)",
+    "legs_competition": "legs (DataType, Competition)",
+    "legs_player": "legs (Player)",
+    "legs_url": "legs (URL)",
+    "legs_date": "legs (ParsedDate)",
+    "legs_file": "legs (File)",
+    "matches_league": "matches (DataType, Venue, Season, Division)",
+    "matches_competition": "matches (DataType, Competition)",
+    "matches_player": "matches (Player)",
+    "matches_file": "matches (File)",
+}
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def selection_filter(selection):
+    """
+    (WHERE clause, parameters) for a Selection, matching Selection.mask:
+    each condition is an equality on an indexed column. Season compares as
+    the sidebar string; SQLite converts it for the INTEGER column.
+    """
+    clauses, params = ["DataType = ?"], [selection.data_type]
+    for col, value in (("Competition", selection.competition), ("Venue", selection.venue),
+                       ("Season", selection.season), ("Division", selection.division)):
+        if value is not None:
+            clauses.append(f"{col} = ?")
+            params.append(value)
+    return " AND ".join(clauses), params
+
+
+class SqliteStore:
+    """
+    Optional storage backend for the CLI (--backend sqlite): the processed
+    legs (without the raw throws) and the match table in an indexed SQLite
+    file next to the snapshot, kept in step with the CSV folder file by file.
+    Selections are indexed equality lookups and the stats and 180s tables are
+    GROUP BY aggregates run inside the database, so answering them does not
+    need the archive in memory.
+    """
+
+    def __init__(self, data_folder, path=None):
+        self.data_folder = data_folder
+        self.path = path or os.path.join(data_folder, SNAPSHOT_DIRNAME, SQLITE_FILE)
+
+    @contextmanager
+    def connect(self):
+        """A connection that commits on success and is always closed."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        con = sqlite3.connect(self.path)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _query(self, sql, params=()):
+        with instrument.stage("sql"), self.connect() as con:
+            return pd.read_sql_query(sql, con, params=params)
+
+    @staticmethod
+    def _create_tables(con):
+        if con.execute("PRAGMA user_version").fetchone()[0] != SQLITE_VERSION:
+            for table in ("legs", "matches", "files"):
+                con.execute(f"DROP TABLE IF EXISTS {table}")
+            con.execute(f"PRAGMA user_version = {SQLITE_VERSION}")
+        for table, columns in (("legs", LEG_COLUMNS), ("matches", MATCH_COLUMNS), ("files", FILE_COLUMNS)):
+            definition = ", ".join(f"{quote(col)} {sql_type}" for col, sql_type in columns.items())
+            con.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definition})")
+        for name, target in INDEXES.items():
+            con.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+    def _stale_files(self, con):
+        """
+        (stale, removed): files to (re)load and files no longer in the folder.
+        Once anything changes, the files that had rows dropped are reloaded
+        too: the file holding those rows may be the one that changed or went.
+        """
+        known = {row[0]: row[1:] for row in con.execute("SELECT File, Size, MtimeNs, Sha1 FROM files")}
+        files = list_csv_files(self.data_folder)
+        stale = []
+        for file in files:
+            path = os.path.join(self.data_folder, file)
+            fingerprint = file_fingerprint(path)
+            entry = known.get(file)
+            if entry is not None and tuple(entry[:2]) == fingerprint:
+                continue
+            if entry is not None and entry[2] == file_digest(path):
+                # Touched, same content
+                con.execute("UPDATE files SET Size = ?, MtimeNs = ? WHERE File = ?", (*fingerprint, file))
+                continue
+            stale.append(file)
+        removed = [file for file in known if file not in files]
+        if stale or removed:
+            gave_up = [row[0] for row in con.execute("SELECT File FROM files WHERE Dropped > 0")]
+            stale = sorted({*stale, *(file for file in gave_up if file in files)})
+        return stale, removed
+
+    @staticmethod
+    def _insert(con, table, frame, columns):
+        frame = frame.assign(Competition=competition_labels(frame))
+        frame[[col for col in columns if col in frame.columns]].to_sql(table, con, if_exists="append", index=False)
+
+    def _seed_index(self, con, ingest):
+        """
+        Seed the ingest cache's leg index with the stored legs of the files it
+        has not indexed, so rows of the files synced next that are already in
+        the database are dropped as duplicates (the stored row wins).
+        """
+        stored = [row[0] for row in con.execute("SELECT DISTINCT File FROM legs ORDER BY File")]
+        files = [file for file in stored if file not in ingest.index]
+        if not files:
+            return
+        columns = ", ".join(quote(col) for col in dict.fromkeys(["File", *LEG_KEY, *CONTENT_COLUMNS]))
+        placeholders = ", ".join("?" * len(files))
+        legs = pd.read_sql_query(f"SELECT {columns} FROM legs WHERE File IN ({placeholders}) ORDER BY File, LegId",
+                                 con, params=files)
+        names, starts = np.unique(legs.pop("File").to_numpy(dtype=str), return_index=True)
+        for file, start, end in zip(names, starts, [*starts[1:], len(legs)]):
+            ingest.seed(file, legs.iloc[start:end].reset_index(drop=True))
+
+    def sync(self, ingest=None, workers=None):
+        """
+        Bring the database up to date with the CSV folder: drop the rows of
+        changed and removed files and load the new and changed ones (parsed
+        through the ingest cache, across `workers` processes). A leg held by
+        several files is stored once, from the first of them by name (see
+        LegIndex), as a load of the whole folder would keep it.
+        Returns the (file, error) pairs of the files that could not be read.
+        """
+        ingest = ingest or IngestCache()
+        with self.connect() as con:
+            self._create_tables(con)
+            with instrument.stage("sql_changes"):
+                stale, removed = self._stale_files(con)
+            for file in stale + removed:
+                for table in ("legs", "matches", "files"):
+                    con.execute(f"DELETE FROM {table} WHERE File = ?", (file,))
+
+            if stale:
+                with instrument.stage("dedup_seed"):
+                    self._seed_index(con, ingest)
+                with instrument.stage("ingest"):
+                    frames, errors = ingest.frames(self.data_folder, stale, workers=workers)
+                    # Stored files lose the legs a new file that sorts before them also has: reload them
+                    stored = [row[0] for row in con.execute("SELECT DISTINCT File FROM legs")]
+                    losing = sorted(file for file in stored if file in ingest.index and ingest.index.keep(file) is not None)
+                    if losing:
+                        for file in losing:
+                            for table in ("legs", "matches", "files"):
+                                con.execute(f"DELETE FROM {table} WHERE File = ?", (file,))
+                        reloaded, reload_errors = ingest.frames(self.data_folder, losing, workers=workers)
+                        frames, errors = dict(sorted({**frames, **reloaded}.items())), errors + reload_errors
+                        stale = sorted(stale + losing)
+                    legs = combine_frames(frames)
+                with instrument.stage("sql_write"):
+                    failed = dict(errors)
+                    for file in stale:
+                        path = os.path.join(self.data_folder, file)
+                        error = str(failed[file]) if file in failed else None
+                        keep = None if error else ingest.index.keep(file)
+                        dropped = 0 if keep is None else int((~keep).sum())
+                        con.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                                    (file, *file_fingerprint(path), file_digest(path), error, dropped))
+                    if not legs.empty:
+                        # LegIds carry on from the rows already stored
+                        next_id = con.execute("SELECT COALESCE(MAX(LegId) + 1, 0) FROM legs").fetchone()[0]
+                        legs = legs.assign(LegId=legs["LegId"].to_numpy() + next_id)
+                        matches = build_match_table(legs)
+                        matches["File"] = legs["File"].to_numpy(dtype=str)[matches["FirstLegId"].to_numpy() - next_id]
+                        self._insert(con, "legs", legs, LEG_COLUMNS)
+                        self._insert(con, "matches", matches, MATCH_COLUMNS)
+            instrument.cache_event("sql_file", hit=True, count=len(list_csv_files(self.data_folder)) - len(stale))
+            if stale:
+                instrument.cache_event("sql_file", hit=False, count=len(stale))
+            errors = con.execute("SELECT File, Error FROM files WHERE Error IS NOT NULL ORDER BY File").fetchall()
+        return errors
+
+    @property
+    def empty(self):
+        with self.connect() as con:
+            self._create_tables(con)
+            return con.execute("SELECT 1 FROM legs LIMIT 1").fetchone() is None
+
+    def leg_sums(self, selection):
+        """
+        Per-player sums of the cube measures inside a selection (the SQL
+        counterpart of cube.sum_cells), players in order of their first leg.
+        """
+        where, params = selection_filter(selection)
+        return self._query(f"""
+            WITH leg_sums AS (
+                SELECT Player, MIN(LegId) AS FirstLegId,
+                       TOTAL(Count180) AS Count180, TOTAL(Count140) AS Count140, TOTAL(Count100) AS Count100,
+                       TOTAL(TotalScored) AS TotalScored, TOTAL("Total Darts") AS "Total Darts",
+                       TOTAL(First9Sum) AS First9Sum, TOTAL(First9Count) AS First9Count,
+                       TOTAL(First9Avg) AS First9AvgSum, COUNT(First9Avg) AS First9AvgCount,
+                       COUNT(*) AS LegsPlayed, TOTAL(UPPER(Result) = 'WON') AS LegsWon
+                FROM legs WHERE {where} GROUP BY Player
+            ), match_sums AS (
+                SELECT Player, COUNT(*) AS MatchesPlayed, TOTAL(MatchResult = 'WON') AS MatchesWon
+                FROM matches WHERE {where} GROUP BY Player
+            )
+            SELECT leg_sums.*, COALESCE(MatchesPlayed, 0) AS MatchesPlayed, COALESCE(MatchesWon, 0) AS MatchesWon
+            FROM leg_sums LEFT JOIN match_sums USING (Player)
+            ORDER BY FirstLegId
+        """, params + params).drop(columns="FirstLegId")
+
+    def band_counts(self, selection):
+        """Per-player 180 / 140+ / 100+ totals for the 180s table."""
+        sums = self.leg_sums(selection)
+        return sums[["Player", "Count180", "Count140", "Count100"]].astype(
+            {"Count180": np.int64, "Count140": np.int64, "Count100": np.int64})
+
+    def player_stats(self, selection):
+        """Per-player match/leg win rates and averages for the Player Stats table."""
+        return stats_from_sums(self.leg_sums(selection))
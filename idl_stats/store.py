@@ -0,0 +1,168 @@
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    feather = None
+
+from idl_stats import instrument
+from idl_stats.engine import THROW_PREFIX
+from idl_stats.ingest import file_digest, file_fingerprint, list_csv_files
+
+# Bump whenever the processed legs frame changes shape, so old snapshots are rebuilt
+SNAPSHOT_VERSION = 5
+
+SNAPSHOT_DIRNAME = ".snapshot"
+LEGS_FILE = "legs.feather"
+MANIFEST_FILE = "manifest.json"
+
+
+class SnapshotStore:
+    """
+    On-disk columnar snapshot of the processed legs frame, written
+    uncompressed as Feather (Arrow IPC) next to a manifest of the source CSVs
+    it was built from. It makes a cold start a load rather than a re-parse of
+    every CSV. read() converts the categorical and nullable integer columns
+    into the process's own DataFrame, but leaves the Throw_N columns, most of
+    the frame, as Arrow arrays over a memory map of the file: they are only
+    paged in when the visit table is built, and worker processes reading the
+    same snapshot share those pages. Writes go through an atomic rename.
+    """
+
+    def __init__(self, data_folder, snapshot_dir=None):
+        self.data_folder = data_folder
+        self.snapshot_dir = snapshot_dir or os.path.join(data_folder, SNAPSHOT_DIRNAME)
+        self.legs_path = os.path.join(self.snapshot_dir, LEGS_FILE)
+        self.manifest_path = os.path.join(self.snapshot_dir, MANIFEST_FILE)
+
+    @property
+    def enabled(self):
+        return feather is not None
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            return None
+        return manifest
+
+    def manifest(self):
+        """{file: [size, mtime_ns, sha1]} the snapshot was built from, or None without a usable snapshot."""
+        manifest = self._read_manifest()
+        return None if manifest is None else manifest["files"]
+
+    def partial_files(self):
+        """The files in the snapshot that had leg rows dropped in favour of another file's."""
+        manifest = self._read_manifest()
+        return [] if manifest is None else manifest["partial"]
+
+    def is_fresh(self):
+        """
+        True if the snapshot was built from exactly the CSVs currently in the folder.
+        Files whose size/mtime moved are re-hashed, so a copy or touch alone
+        does not force a rebuild.
+        """
+        if not self.enabled or not os.path.exists(self.legs_path):
+            return False
+        manifest = self._read_manifest()
+        if manifest is None:
+            return False
+
+        recorded = manifest["files"]
+        files = list_csv_files(self.data_folder)
+        if sorted(recorded) != files:
+            return False
+
+        touched = False
+        for file in files:
+            path = os.path.join(self.data_folder, file)
+            size, mtime_ns, digest = recorded[file]
+            fingerprint = file_fingerprint(path)
+            if fingerprint == (size, mtime_ns):
+                continue
+            if fingerprint[0] != size or file_digest(path) != digest:
+                return False
+            recorded[file] = [*fingerprint, digest]
+            touched = True
+
+        if touched:
+            self._write_manifest(recorded, manifest["partial"])
+        return True
+
+    def table(self, columns=None):
+        """The snapshot as an Arrow table, read through a memory map (no extra read buffer)."""
+        return feather.read_table(self.legs_path, columns=columns, memory_map=True)
+
+    def read(self, columns=None):
+        """
+        The snapshot as a DataFrame (the requested columns, all by default).
+        Throw_N columns are not copied: they stay Arrow-backed over the memory map.
+        """
+        table = self.table(columns)
+        throws = [col for col in table.column_names if col.startswith(THROW_PREFIX)]
+        df = table.drop_columns(throws).to_pandas()
+        df = df.assign(**{col: pd.arrays.ArrowExtensionArray(table.column(col)) for col in throws})
+        return df[table.column_names]
+
+    def _write_manifest(self, files, partial):
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "files": files, "partial": sorted(partial)}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def write(self, full_df, files, partial=()):
+        """
+        Persist the legs frame and the manifest ({file: [size, mtime_ns, sha1]}) it was
+        built from, with the files that had rows dropped as duplicates (`partial`).
+        Returns False if the frame could not be written (the app keeps working from memory).
+        """
+        if not self.enabled:
+            return False
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_path = f"{self.legs_path}.{os.getpid()}.tmp"
+        try:
+            feather.write_feather(full_df, tmp_path, compression="uncompressed")
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        try:
+            # Fails where a file cannot be replaced while it is mapped (Windows)
+            os.replace(tmp_path, self.legs_path)
+        except OSError:
+            os.remove(tmp_path)
+            return False
+        self._write_manifest(files, partial)
+        return True
+
+
+def load_with_snapshot(data_folder, ingest_cache, store=None, workers=None):
+    """
+    Return (full_df, errors): straight from the snapshot when it matches the
+    folder, otherwise through the ingest cache (parsing changed files across
+    `workers` processes), refreshing the snapshot after. A snapshot load seeds
+    the ingest cache with its files, so the next load only parses the
+    files added or changed since.
+    """
+    store = store or SnapshotStore(data_folder)
+    with instrument.stage("snapshot_check"):
+        fresh = store.is_fresh()
+    instrument.cache_event("snapshot", hit=fresh)
+    if fresh:
+        with instrument.stage("snapshot_read"):
+            full_df = store.read()
+        ingest_cache.seed_frames(data_folder, full_df, store.manifest(), store.partial_files())
+        return full_df, []
+
+    with instrument.stage("ingest"):
+        full_df, errors = ingest_cache.load(data_folder, workers=workers)
+    if not full_df.empty:
+        with instrument.stage("snapshot_write"):
+            store.write(full_df, ingest_cache.manifest(), ingest_cache.partial_files())
+    return full_df, errors
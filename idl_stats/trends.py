@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+# Default form windows
+FORM_LEGS = 20
+FORM_MATCHES = 5
+# Half-life, in legs, of the exponentially weighted average
+FORM_HALFLIFE = 10
+
+FORM_COLUMNS = ["Player", "Legs", "Matches", "3DartAvg", "LastLegsAvg", "LastMatchesAvg", "EWAvg", "Form"]
+
+
+def three_dart_avg(scored, darts):
+    """3-dart average of summed points and darts (0 where no darts were thrown, like the tables)."""
+    scored = np.asarray(scored, dtype=float)
+    darts = np.asarray(darts, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(darts > 0, scored / darts * 3, 0.0)
+
+
+class TrendIndex:
+    """
+    Every player's legs in chronological order (Grand Prix date or league
+    season, then file order), one contiguous run per (DataType, Player),
+    with running totals of TotalScored and Total Darts. Any window of a
+    player's legs (last N legs, last N matches, one date or season) is a
+    difference of two running totals.
+    """
+
+    def __init__(self, legs):
+        data_types = legs["DataType"].astype(str).to_numpy()
+        players = legs["Player"].astype(str).to_numpy()
+        is_gp = data_types == "Competition"
+        dates = legs["ParsedDate"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        seasons = legs["Season"].astype("float64").to_numpy()
+        missing = np.where(is_gp, np.isnat(legs["ParsedDate"].to_numpy(dtype="datetime64[ns]")), np.isnan(seasons))
+        # Legs without a date / season sort first (oldest) and never form a trend point
+        time = np.where(missing, np.iinfo(np.int64).min, np.where(is_gp, dates, np.nan_to_num(seasons).astype(np.int64)))
+
+        dt_codes, dt_names = pd.factorize(data_types)
+        player_codes, player_names = pd.factorize(players)
+        leg_ids = legs["LegId"].to_numpy()
+        order = np.lexsort((leg_ids, time, player_codes, dt_codes))
+
+        self.time = time[order]
+        self.missing = missing[order]
+        self.is_gp = is_gp[order]
+        scored = legs["TotalScored"].to_numpy(dtype=float, na_value=0.0)[order]
+        darts = legs["Total Darts"].to_numpy(dtype=float, na_value=0.0)[order]
+        self.cum_scored = np.concatenate([[0.0], scored.cumsum()])
+        self.cum_darts = np.concatenate([[0.0], darts.cumsum()])
+
+        # One run of legs per (DataType, Player)
+        group = dt_codes[order].astype(np.int64) * len(player_names) + player_codes[order]
+        self.starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]]) if len(group) else np.array([], dtype=int)
+        self.ends = np.r_[self.starts[1:], len(group)]
+        self.data_types = dt_names[dt_codes[order][self.starts]]
+        self.players = player_names[player_codes[order][self.starts]]
+        self._groups = {(dt, player): i for i, (dt, player) in enumerate(zip(self.data_types, self.players))}
+
+        # A new match starts wherever the run, the match URL or the opponent changes
+        urls = legs["URL"].astype(str).to_numpy()[order]
+        opponents = legs["Opponent"].astype(str).to_numpy()[order]
+        new_match = np.ones(len(group), dtype=bool)
+        new_match[1:] = (group[1:] != group[:-1]) | (urls[1:] != urls[:-1]) | (opponents[1:] != opponents[:-1])
+        self.match_starts = np.flatnonzero(new_match)
+        self.group_matches = np.searchsorted(self.match_starts, self.starts)  # first match of each run
+        self.group_matches_end = np.r_[self.group_matches[1:], len(self.match_starts)]
+
+    def _window(self, start, end):
+        return self.cum_scored[end] - self.cum_scored[start], self.cum_darts[end] - self.cum_darts[start]
+
+    def _run(self, player, data_type):
+        i = self._groups.get((data_type, str(player)))
+        return (None, None) if i is None else (self.starts[i], self.ends[i])
+
+    def trend(self, player, data_type):
+        """
+        3-dart average per date (Grand Prix) or season (League) of one player,
+        oldest first: columns ParsedDate or Season (as str) and 3DartAvg.
+        """
+        time_col = "ParsedDate" if data_type == "Competition" else "Season"
+        start, end = self._run(player, data_type)
+        if start is None:
+            return pd.DataFrame(columns=[time_col, "3DartAvg"])
+        start += int(self.missing[start:end].sum())  # undated legs sort first
+        time = self.time[start:end]
+        period_starts = start + np.flatnonzero(np.r_[True, time[1:] != time[:-1]]) if end > start else np.array([], dtype=int)
+        period_ends = np.r_[period_starts[1:], end]
+        scored, darts = self._window(period_starts, period_ends)
+
+        times = self.time[period_starts]
+        values = pd.to_datetime(times) if time_col == "ParsedDate" else times.astype(str)
+        return pd.DataFrame({time_col: values, "3DartAvg": three_dart_avg(scored, darts)})
+
+    def rolling(self, player, data_type, legs=FORM_LEGS):
+        """The player's average over the last `legs` legs after each leg (fewer at the start)."""
+        start, end = self._run(player, data_type)
+        if start is None:
+            return pd.Series(dtype=float, name="RollingAvg")
+        ends = np.arange(start + 1, end + 1)
+        scored, darts = self._window(np.maximum(ends - legs, start), ends)
+        return pd.Series(three_dart_avg(scored, darts), name="RollingAvg")
+
+    def form(self, data_type, legs=FORM_LEGS, matches=FORM_MATCHES, halflife=FORM_HALFLIFE, players=None):
+        """
+        Form of every player of a DataType (optionally only `players`):
+        career average, last `legs` legs, last `matches` matches, an
+        exponentially weighted average (weights halve every `halflife` legs)
+        and Form, the last-legs average minus the career average.
+        """
+        groups = np.flatnonzero(self.data_types == data_type)
+        if players is not None:
+            groups = groups[np.isin(self.players[groups], np.asarray(list(players), dtype=str))]
+        starts, ends = self.starts[groups], self.ends[groups]
+        match_first, match_end = self.group_matches[groups], self.group_matches_end[groups]
+
+        career = three_dart_avg(*self._window(starts, ends))
+        last_legs = three_dart_avg(*self._window(np.maximum(ends - legs, starts), ends))
+        first_recent_match = self.match_starts[np.maximum(match_end - matches, match_first)] if len(groups) else starts
+        last_matches = three_dart_avg(*self._window(first_recent_match, ends))
+
+        # Exponential weights by legs ago, summed per run (one pass over the legs)
+        lengths = ends - starts
+        run_of_leg = np.repeat(np.arange(len(groups)), lengths)
+        # Each run's start, plus the leg's offset within its run
+        positions = np.repeat(starts, lengths) + np.arange(len(run_of_leg)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        weights = 0.5 ** ((ends[run_of_leg] - 1 - positions) / halflife)
+        scored = np.diff(self.cum_scored)[positions] * weights
+        darts = np.diff(self.cum_darts)[positions] * weights
+        ew = three_dart_avg(np.bincount(run_of_leg, scored, len(groups)), np.bincount(run_of_leg, darts, len(groups)))
+
+        return pd.DataFrame({
+            "Player": self.players[groups],
+            "Legs": ends - starts,
+            "Matches": match_end - match_first,
+            "3DartAvg": career,
+            "LastLegsAvg": last_legs,
+            "LastMatchesAvg": last_matches,
+            "EWAvg": ew,
+            "Form": last_legs - career,
+        })[FORM_COLUMNS]
+
+
+def build_trend_index(legs):
+    return TrendIndex(legs)
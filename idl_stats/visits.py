@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from idl_stats.engine import throw_matrix
+
+START_SCORE = 501
+MAX_VISIT_SCORE = 180
+
+
+def build_visit_table(legs, start_score=START_SCORE):
+    """
+    Long-format visit table: one row per thrown visit with
+    LegId (links back to the legs table), Visit (1-based), Score and Remaining.
+    Built straight from the Throw_* matrix, so missing visits never appear.
+    """
+    throws = throw_matrix(legs)
+    valid = ~np.isnan(throws)
+    leg_idx, visit_idx = np.nonzero(valid)
+    running = np.where(valid, throws, 0.0).cumsum(axis=1)
+
+    return pd.DataFrame({
+        "LegId": legs["LegId"].to_numpy()[leg_idx].astype(np.int32),
+        "Visit": (visit_idx + 1).astype(np.int16),
+        "Score": throws[leg_idx, visit_idx].astype(np.int16),
+        "Remaining": (start_score - running[leg_idx, visit_idx]).astype(np.int16),
+    })
+
+
+def visits_for_legs(visits, legs):
+    """Restrict the visit table to the legs in a (filtered) legs frame."""
+    return visits[np.isin(visits["LegId"].to_numpy(), legs["LegId"].to_numpy())]
+
+
+def score_distribution(visits):
+    """Count of visits for every score 0-180 (index = score)."""
+    scores = visits["Score"].to_numpy()
+    scores = scores[(scores >= 0) & (scores <= MAX_VISIT_SCORE)]
+    return pd.Series(np.bincount(scores, minlength=MAX_VISIT_SCORE + 1), name="Visits")
+
+
+def visits_to_reach(visits, remaining=100):
+    """Per leg, the first visit after which the score left is at or below `remaining`."""
+    reached = visits[visits["Remaining"] <= remaining]
+    return reached.groupby("LegId")["Visit"].min().rename("VisitsToReach")
+
+
+def finishing_visits(visits):
+    """The checkout visit of every leg that was finished (Remaining hits 0)."""
+    return visits[visits["Remaining"] == 0].drop_duplicates("LegId", keep="first")